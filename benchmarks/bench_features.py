@@ -0,0 +1,73 @@
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "core"))
+
+from baseline_labeller import collect_last_words, compute_features, compute_song_features, generate_pairs
+from feature_matrix import columns_to_rows
+
+
+### -------------------------------
+# 1. Synthetic Last Words
+### -------------------------------
+def random_last_words(count, seed=0):
+    """
+    Last-word dicts drawn from the vocabulary of temp/temp.jsonl, plus a few
+    empty phoneme and stress values to exercise the edge cases.
+    """
+    rng = random.Random(seed)
+    with open("./temp/temp.jsonl", "r", encoding="utf-8") as f:
+        song = json.loads(f.readline())
+    vocab = [w for line in song["lines"] for w in line["words"]]
+    vocab.append({"text": "hmm", "phonemes": [], "syllables": 0, "stress": "", "rhyme_ending": ""})
+
+    words = []
+    for _ in range(count):
+        word = dict(rng.choice(vocab))
+        word["rhyme_id"] = rng.choice("ABCDEFGH")
+        words.append(word)
+    return words
+
+
+### -------------------------------
+# 2. Parity and Timing
+### -------------------------------
+def check_parity(last_words):
+    expected = compute_features(generate_pairs(last_words))
+    actual = columns_to_rows(compute_song_features(last_words))
+    assert actual == expected, "vectorised features differ from compute_features"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check and time the vectorised compute_features")
+    parser.add_argument("--words", type=int, default=300)
+    args = parser.parse_args()
+
+    with open("./temp/temp.jsonl", "r", encoding="utf-8") as f:
+        check_parity(collect_last_words(json.loads(f.readline())))
+    for seed in range(20):
+        check_parity(random_last_words(random.Random(seed).randint(0, 60), seed))
+    print("✅ Vectorised features match compute_features")
+
+    last_words = random_last_words(args.words)
+    pair_count = args.words * (args.words - 1) // 2
+
+    start = time.perf_counter()
+    compute_features(generate_pairs(last_words))
+    rows_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    compute_song_features(last_words)
+    columns_time = time.perf_counter() - start
+
+    print(f"Words: {args.words}, pairs: {pair_count}")
+    print(f"compute_features:      {rows_time:.3f}s ({pair_count / rows_time:,.0f} pairs/s)")
+    print(f"compute_song_features: {columns_time:.3f}s ({pair_count / columns_time:,.0f} pairs/s)")
+
+
+if __name__ == "__main__":
+    main()
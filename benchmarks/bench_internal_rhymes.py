@@ -0,0 +1,50 @@
+import argparse
+import copy
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "core"))
+
+from internal_rhyme_detector import detect_internal_rhymes
+
+
+### -------------------------------
+# 1. Scale a Song to N Lines
+### -------------------------------
+def repeat_song(song, target_lines):
+    source = [line for line in song["lines"] if line["words"]]
+    lines = []
+    for idx in range(target_lines):
+        line = copy.deepcopy(source[idx % len(source)])
+        line["line_id"] = idx
+        lines.append(line)
+    return {"artist": song["artist"], "title": song["title"], "lines": lines}
+
+
+### -------------------------------
+# 2. Benchmark
+### -------------------------------
+def main():
+    parser = argparse.ArgumentParser(description="Measure internal rhyme detection throughput")
+    parser.add_argument("--input", default="./temp/temp.jsonl")
+    parser.add_argument("--lines", type=int, default=10000)
+    parser.add_argument("--window", type=int, default=1)
+    args = parser.parse_args()
+
+    with open(args.input, "r", encoding="utf-8") as f:
+        song = repeat_song(json.loads(f.readline()), args.lines)
+    word_count = sum(len(line["words"]) for line in song["lines"])
+
+    start = time.perf_counter()
+    detect_internal_rhymes(song, window=args.window)
+    elapsed = time.perf_counter() - start
+
+    spans = sum(len(line["internal_rhymes"]) for line in song["lines"])
+    print(f"Lines: {args.lines}, words: {word_count}, rhyming words: {spans}")
+    print(f"{elapsed:.3f}s ({word_count / elapsed:,.0f} words/s)")
+
+
+if __name__ == "__main__":
+    main()
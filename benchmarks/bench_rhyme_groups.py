@@ -0,0 +1,102 @@
+import argparse
+import copy
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "core"))
+
+from baseline_rhyme_detector import detect_rhyme_groups, generate_rhyme_group, phoneme_similarity
+
+
+### -------------------------------
+# 1. Reference Linear Scan
+### -------------------------------
+def detect_rhyme_groups_linear(song, min_match_phonemes=2):
+    """
+    The original O(lines x groups) implementation, kept as the parity reference.
+    """
+    rhyme_groups = {}
+    rhyme_group_gen = generate_rhyme_group()
+
+    for line in song["lines"]:
+        if not line["words"]:
+            continue
+        rhyme_key = tuple(line["words"][-1]["rhyme_ending"].split())
+
+        assigned = False
+        for key, group in rhyme_groups.items():
+            if phoneme_similarity(rhyme_key, key) >= min_match_phonemes:
+                line["rhyme_id"] = group
+                assigned = True
+                break
+
+        if not assigned:
+            group_id = next(rhyme_group_gen)
+            rhyme_groups[rhyme_key] = group_id
+            line["rhyme_id"] = group_id
+
+    return song
+
+
+### -------------------------------
+# 2. Scale a Song to N Lines
+### -------------------------------
+def scale_song(song, target_lines, seed=0):
+    """
+    Repeats the song's lines up to target_lines and rewrites the last word's
+    rhyme_ending with random phoneme tails, so the number of distinct groups
+    grows with the song like it does in long freestyle transcripts.
+    """
+    rng = random.Random(seed)
+    phonemes = sorted({p for line in song["lines"] for w in line["words"] for p in w["phonemes"]})
+    source = [line for line in song["lines"] if line["words"]]
+
+    lines = []
+    for idx in range(target_lines):
+        line = copy.deepcopy(source[idx % len(source)])
+        line["line_id"] = idx
+        tail = [rng.choice(phonemes) for _ in range(rng.randint(1, 4))]
+        line["words"][-1]["rhyme_ending"] = " ".join(tail)
+        lines.append(line)
+
+    return {"artist": song["artist"], "title": song["title"], "lines": lines}
+
+
+### -------------------------------
+# 3. Benchmark
+### -------------------------------
+def time_call(fn, song, min_match_phonemes):
+    song = copy.deepcopy(song)
+    start = time.perf_counter()
+    fn(song, min_match_phonemes)
+    return time.perf_counter() - start, [line.get("rhyme_id") for line in song["lines"]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark detect_rhyme_groups against the linear scan")
+    parser.add_argument("--input", default="./temp/temp.jsonl")
+    parser.add_argument("--lines", type=int, default=10000)
+    parser.add_argument("--min-match", type=int, default=2)
+    args = parser.parse_args()
+
+    with open(args.input, "r", encoding="utf-8") as f:
+        song = json.loads(f.readline())
+    song = scale_song(song, args.lines)
+
+    indexed_time, indexed_ids = time_call(detect_rhyme_groups, song, args.min_match)
+    linear_time, linear_ids = time_call(detect_rhyme_groups_linear, song, args.min_match)
+
+    assert indexed_ids == linear_ids, "rhyme_id assignment differs from the linear scan"
+
+    groups = len(set(indexed_ids))
+    print(f"Lines: {args.lines}, groups: {groups}")
+    print(f"Linear scan:  {linear_time:.3f}s ({args.lines / linear_time:,.0f} lines/s)")
+    print(f"Suffix index: {indexed_time:.3f}s ({args.lines / indexed_time:,.0f} lines/s)")
+    print(f"✅ Identical rhyme_ids, {linear_time / indexed_time:.1f}x faster")
+
+
+if __name__ == "__main__":
+    main()
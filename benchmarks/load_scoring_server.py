@@ -0,0 +1,141 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+
+import numpy as np
+
+
+### -------------------------------
+# 1. Request Bodies
+### -------------------------------
+def load_words(path, limit=5000):
+    """
+    Distinct words from a preprocessed JSONL corpus, or a default list.
+    """
+    if not path:
+        return ["night", "light", "fight", "day", "way", "say", "back", "track", "stack", "flow", "go",
+                "show", "money", "honey", "funny", "mind", "find", "time", "rhyme", "crime"]
+    words = []
+    seen = set()
+    with open(path, "r", encoding="utf-8") as f:
+        for raw in f:
+            if not raw.strip():
+                continue
+            for line in json.loads(raw)["lines"]:
+                for word in line.get("words", []):
+                    if word["text"] not in seen:
+                        seen.add(word["text"])
+                        words.append(word["text"])
+            if len(words) >= limit:
+                break
+    return words
+
+
+def make_body(rng, words, pairs_per_request):
+    pairs = [[rng.choice(words), rng.choice(words)] for _ in range(pairs_per_request)]
+    return json.dumps({"pairs": pairs}).encode("utf-8")
+
+
+### -------------------------------
+# 2. Keep-Alive Client
+### -------------------------------
+async def client(host, port, requests, words, pairs_per_request, seed, latencies):
+    rng = random.Random(seed)
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for _ in range(requests):
+            body = make_body(rng, words, pairs_per_request)
+            start = time.perf_counter()
+            writer.write(
+                f"POST /score HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\n\r\n".encode("latin-1") + body
+            )
+            await writer.drain()
+
+            status = await reader.readline()
+            length = 0
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                if name.lower() == "content-length":
+                    length = int(value)
+            await reader.readexactly(length)
+            if b" 200 " not in status:
+                raise RuntimeError(f"server answered {status.decode().strip()}")
+            latencies.append(time.perf_counter() - start)
+    finally:
+        writer.close()
+
+
+async def fetch_stats(host, port):
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(f"GET /stats HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n\r\n".encode("latin-1"))
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    return json.loads(response.split(b"\r\n\r\n", 1)[1])
+
+
+async def run(args, words):
+    latencies = []
+    before = await fetch_stats(args.host, args.port)
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        client(args.host, args.port, args.requests, words, args.pairs, args.seed + k, latencies)
+        for k in range(args.clients)
+    ))
+    elapsed = time.perf_counter() - start
+    after = await fetch_stats(args.host, args.port)
+    return latencies, elapsed, before, after
+
+
+### -------------------------------
+# 3. Main
+### -------------------------------
+def main():
+    parser = argparse.ArgumentParser(description="Load-test a running scoring_server.py")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--clients", type=int, default=32, help="Concurrent keep-alive connections")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per client")
+    parser.add_argument("--pairs", type=int, default=4, help="Word pairs per request")
+    parser.add_argument("--words", default=None, help="Preprocessed JSONL to draw words from")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="Also save the results as JSON")
+    args = parser.parse_args()
+
+    words = load_words(args.words)
+    latencies, elapsed, before, after = asyncio.run(run(args, words))
+
+    ms = np.array(latencies) * 1000
+    batches = after["batches"] - before["batches"]
+    result = {
+        "requests": len(ms),
+        "pairs": len(ms) * args.pairs,
+        "seconds": round(elapsed, 3),
+        "requests_per_sec": round(len(ms) / elapsed, 1),
+        "pairs_per_sec": round(len(ms) * args.pairs / elapsed, 1),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "max_ms": round(float(ms.max()), 3),
+        "batches": batches,
+        "requests_per_batch": round((after["requests"] - before["requests"]) / batches, 2) if batches else None,
+    }
+
+    print(f"{result['requests']} requests from {args.clients} clients in {elapsed:.2f}s")
+    print(f"Throughput: {result['requests_per_sec']:,.0f} req/s, {result['pairs_per_sec']:,.0f} pairs/s")
+    print(f"Latency: p50 {result['p50_ms']} ms, p95 {result['p95_ms']} ms, p99 {result['p99_ms']} ms")
+    print(f"Batches: {batches} ({result['requests_per_batch']} requests per batch)")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
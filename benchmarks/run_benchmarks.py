@@ -0,0 +1,171 @@
+import argparse
+import copy
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "core"))
+
+from baseline_labeller import (collect_last_words, compute_features, format_csv_columns, generate_pairs,
+                               iter_song_feature_blocks, save_to_csv)
+from baseline_rhyme_detector import detect_rhyme_groups
+from synthetic_corpus import add_corpus_arguments, corpus_params, generate_corpus
+
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+### -------------------------------
+# 1. Measurement
+### -------------------------------
+def rss_high_water_mb():
+    # ru_maxrss is KB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def measure(name, fn, units, trace_memory=False):
+    """
+    Times fn() and returns its stage record. fn returns a dict of counts;
+    `units` names the counts to report as per-second rates.
+
+    rss_high_water_mb is the process's highest RSS so far, including
+    earlier stages and the corpus itself, so it never goes down from one
+    stage to the next. The per-stage memory figure is traced_peak_mb.
+    """
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    counts = fn()
+    elapsed = time.perf_counter() - start
+
+    record = {"seconds": round(elapsed, 4), **counts}
+    for unit in units:
+        record[f"{unit}_per_sec"] = round(counts[unit] / elapsed, 1) if elapsed > 0 else None
+    record["rss_high_water_mb"] = round(rss_high_water_mb(), 1)
+    if trace_memory:
+        record["traced_peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 2**20, 1)
+        tracemalloc.stop()
+
+    print(f"{name:<24} {elapsed:8.3f}s  " + "  ".join(
+        f"{record[f'{unit}_per_sec']:,.0f} {unit}/s" for unit in units))
+    return record
+
+
+def git_commit():
+    try:
+        # Run inside the repo, so the commit is found from any working directory
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+### -------------------------------
+# 2. Stages
+### -------------------------------
+def run_stages(songs, trace_memory=False, row_limit=2_000_000):
+    stages = {}
+    line_count = sum(len(song["lines"]) for song in songs)
+
+    def detect():
+        for song in songs:
+            detect_rhyme_groups(song)
+        return {"songs": len(songs), "lines": line_count}
+    stages["detect_rhyme_groups"] = measure("detect_rhyme_groups", detect, ["songs", "lines"], trace_memory)
+
+    last_words = [collect_last_words(song) for song in songs]
+    pair_count = sum(len(generate_pairs(words)) for words in last_words)
+
+    def pairs():
+        for words in last_words:
+            for _ in generate_pairs(words):
+                pass
+        return {"pairs": pair_count}
+    stages["generate_pairs"] = measure("generate_pairs", pairs, ["pairs"], trace_memory)
+
+    # The row-based path is slow; cap it so big corpora still finish
+    row_songs = []
+    row_pairs = 0
+    for words in last_words:
+        if row_pairs >= row_limit:
+            break
+        row_songs.append(words)
+        row_pairs += len(generate_pairs(words))
+    features = []
+
+    def rows():
+        for words in row_songs:
+            features.extend(compute_features(generate_pairs(words)))
+        return {"pairs": row_pairs}
+    stages["compute_features"] = measure("compute_features", rows, ["pairs"], trace_memory)
+
+    def columns():
+        for words in last_words:
+            for block in iter_song_feature_blocks(words):
+                format_csv_columns(block)
+        return {"pairs": pair_count}
+    stages["feature_columns_csv"] = measure("feature_columns+csv", columns, ["pairs"], trace_memory)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        def save():
+            save_to_csv(features, os.path.join(tmp, "rhyme_pairs.csv"))
+            return {"rows": len(features)}
+        stages["save_to_csv"] = measure("save_to_csv", save, ["rows"], trace_memory)
+
+    return stages
+
+
+### -------------------------------
+# 3. Compare Runs
+### -------------------------------
+def compare(current, baseline_path):
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    print(f"\nCompared with {baseline['commit']} ({baseline_path}):")
+    for name, stage in current["stages"].items():
+        old = baseline["stages"].get(name)
+        if not old or not old["seconds"]:
+            continue
+        ratio = old["seconds"] / stage["seconds"] if stage["seconds"] else float("inf")
+        print(f"{name:<24} {old['seconds']:8.3f}s -> {stage['seconds']:8.3f}s  ({ratio:.2f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the rhyme pipeline on a synthetic corpus")
+    add_corpus_arguments(parser)
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="Also record the tracemalloc peak of each stage (slower)")
+    parser.add_argument("--output", default=None, help="Result JSON path (default: results/<commit>.json)")
+    parser.add_argument("--compare", default=None, help="Earlier result JSON to compare against")
+    args = parser.parse_args()
+
+    params = corpus_params(args)
+    print(f"Generating corpus: {params}")
+    songs = list(generate_corpus(**params))
+
+    result = {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "corpus": params,
+        "stages": run_stages(copy.deepcopy(songs), args.trace_memory),
+    }
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{result['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+    print(f"Saved results to {output}")
+
+    if args.compare:
+        compare(result, args.compare)
+
+
+if __name__ == "__main__":
+    main()
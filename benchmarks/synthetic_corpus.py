@@ -0,0 +1,131 @@
+import argparse
+import json
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "core"))
+
+from pronunciation import word_record
+
+
+CONSONANTS = ["B", "D", "F", "G", "K", "L", "M", "N", "P", "R", "S", "T", "V", "Z", "CH", "SH", "TH"]
+VOWELS = ["AA", "AE", "AH", "AO", "AW", "AY", "EH", "ER", "EY", "IH", "IY", "OW", "OY", "UH", "UW"]
+
+
+### -------------------------------
+# 1. Synthetic Vocabulary
+### -------------------------------
+def random_syllable(rng, stress):
+    phonemes = []
+    if rng.random() < 0.8:
+        phonemes.append(rng.choice(CONSONANTS))
+    phonemes.append(rng.choice(VOWELS) + stress)
+    if rng.random() < 0.6:
+        phonemes.append(rng.choice(CONSONANTS))
+    return phonemes
+
+
+def make_vocabulary(rng, vocab_size, rhyme_families):
+    """
+    Builds vocab_size word records in the preprocessed schema. Words are
+    spread over rhyme_families shared endings, so words from one family
+    rhyme under detect_rhyme_groups.
+    """
+    endings = [random_syllable(rng, "1") for _ in range(rhyme_families)]
+    for ending in endings:
+        # A rhyme ending needs two phonemes to match under min_match_phonemes=2
+        if ending[-1][-1].isdigit():
+            ending.append(rng.choice(CONSONANTS))
+
+    words = []
+    for idx in range(vocab_size):
+        family = idx % rhyme_families
+        phonemes = []
+        for _ in range(rng.randint(0, 2)):
+            phonemes.extend(random_syllable(rng, rng.choice("02")))
+        phonemes.extend(endings[family])
+        record = word_record(f"w{idx}", phonemes)
+        record["family"] = family
+        words.append(record)
+    return words
+
+
+### -------------------------------
+# 2. Synthetic Songs
+### -------------------------------
+def make_song(rng, idx, words, by_family, lines_per_song, words_per_line, rhyme_density):
+    """
+    One song in the temp/temp.jsonl schema. With probability rhyme_density
+    a line ends on a word from the previous line's rhyme family.
+    """
+    lines = []
+    family = None
+    for line_id in range(lines_per_song):
+        line_words = [rng.choice(words) for _ in range(rng.randint(*words_per_line) - 1)]
+        if family is not None and rng.random() < rhyme_density:
+            last = rng.choice(by_family[family])
+        else:
+            last = rng.choice(words)
+        family = last["family"]
+        line_words.append(last)
+
+        clean = [{k: v for k, v in w.items() if k != "family"} for w in line_words]
+        lines.append({
+            "line_id": line_id,
+            "text": " ".join(w["text"] for w in clean),
+            "words": clean,
+        })
+
+    return {"artist": "synthetic", "title": f"song {idx}", "lines": lines}
+
+
+def generate_corpus(songs=100, lines_per_song=80, vocab_size=2000, rhyme_families=200,
+                    rhyme_density=0.5, words_per_line=(4, 10), seed=0):
+    """
+    Yields synthetic songs. The same arguments always give the same corpus.
+    """
+    rng = random.Random(seed)
+    words = make_vocabulary(rng, vocab_size, rhyme_families)
+    by_family = {}
+    for word in words:
+        by_family.setdefault(word["family"], []).append(word)
+
+    for idx in range(songs):
+        yield make_song(rng, idx, words, by_family, lines_per_song, words_per_line, rhyme_density)
+
+
+def add_corpus_arguments(parser):
+    parser.add_argument("--songs", type=int, default=100)
+    parser.add_argument("--lines", type=int, default=80, help="Lines per song")
+    parser.add_argument("--vocab-size", type=int, default=2000)
+    parser.add_argument("--rhyme-families", type=int, default=200)
+    parser.add_argument("--rhyme-density", type=float, default=0.5)
+    parser.add_argument("--seed", type=int, default=0)
+
+
+def corpus_params(args):
+    return {
+        "songs": args.songs,
+        "lines_per_song": args.lines,
+        "vocab_size": args.vocab_size,
+        "rhyme_families": args.rhyme_families,
+        "rhyme_density": args.rhyme_density,
+        "seed": args.seed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a synthetic preprocessed corpus")
+    add_corpus_arguments(parser)
+    parser.add_argument("--output", default="synthetic_preprocessed.jsonl")
+    args = parser.parse_args()
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        for song in generate_corpus(**corpus_params(args)):
+            f.write(json.dumps(song) + "\n")
+    print(f"Saved {args.songs} synthetic songs to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
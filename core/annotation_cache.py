@@ -0,0 +1,76 @@
+import hashlib
+import json
+import pickle
+import sqlite3
+import zlib
+
+from vocabulary import used_records
+
+
+### -------------------------------
+# 1. Per-Song Result Cache
+### -------------------------------
+class AnnotationCache:
+    """
+    SQLite store of per-song results, keyed by a hash of the song's raw
+    JSONL line plus the parameters that affect the result.
+
+    Any edit to a song changes its key, and so does changing a parameter
+    such as min_match_phonemes, so stale entries are never served; they are
+    simply not hit again. Values are pickled and zlib-compressed.
+
+    With a vocabulary, songs stored as word IDs are also keyed on the
+    records those IDs resolve to, so words added to the vocabulary by later
+    runs leave every other song's entry valid.
+    """
+
+    def __init__(self, path, namespace, params=None, vocab=None):
+        self.namespace = namespace
+        self.vocab = vocab
+        self.salt = json.dumps(params or {}, sort_keys=True).encode("utf-8")
+        self.hits = 0
+        self.misses = 0
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "namespace TEXT NOT NULL, key TEXT NOT NULL, value BLOB NOT NULL, "
+            "PRIMARY KEY (namespace, key))"
+        )
+
+    def key(self, raw_line):
+        digest = hashlib.sha256(self.salt)
+        digest.update(raw_line.strip())
+        if self.vocab is not None and b'"word_ids"' in raw_line:
+            digest.update(used_records(json.loads(raw_line), self.vocab).encode("utf-8"))
+        return digest.hexdigest()
+
+    def get_many(self, keys):
+        unique = list(set(keys))
+        found = {}
+        for start in range(0, len(unique), 500):
+            batch = unique[start:start + 500]
+            rows = self.conn.execute(
+                f"SELECT key, value FROM results WHERE namespace = ? AND key IN ({','.join('?' * len(batch))})",
+                [self.namespace, *batch],
+            )
+            for key, value in rows:
+                found[key] = pickle.loads(zlib.decompress(value))
+        hits = sum(1 for key in keys if key in found)
+        self.hits += hits
+        self.misses += len(keys) - hits
+        return found
+
+    def put_many(self, results):
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO results (namespace, key, value) VALUES (?, ?, ?)",
+                [(self.namespace, key, zlib.compress(pickle.dumps(value, pickle.HIGHEST_PROTOCOL)))
+                 for key, value in results.items()],
+            )
+
+    def close(self):
+        self.conn.close()
+        total = self.hits + self.misses
+        if total:
+            print(f"Cache: {self.hits}/{total} songs reused")
@@ -1,37 +1,74 @@
+import argparse
+import io
 import json
 import csv
-from collections import Counter
+import zlib
+from collections import Counter, defaultdict
 import Levenshtein
+import numpy as np
+
+from columnar import ColumnarWriter
+from feature_matrix import compute_feature_columns, encode_words, iter_pair_blocks
+from jsonl_stream import StreamWriter, iter_jsonl
+from metrics import Metrics, add_metrics_arguments, dump_metrics, profiled
+from annotation_cache import AnnotationCache
+from dedup import add_dedup_arguments, dedup_skip
+from offset_index import add_selection_arguments, selected_spans
+from parallel import map_songs
+from vocabulary import Vocabulary, last_word
 
 
 master_feature_list = []
 
+FEATURE_FIELDS = [
+    'exact_match',
+    'ending_length_min',
+    'phoneme_similarity',
+    'stress_match',
+    'stress_similarity',
+    'syllable_diff',
+    'label',
+]
+
+# Column types for the binary (.npy) output
+FEATURE_DTYPES = {
+    'exact_match': np.int8,
+    'ending_length_min': np.int16,
+    'phoneme_similarity': np.float64,
+    'stress_match': np.int8,
+    'stress_similarity': np.float64,
+    'syllable_diff': np.int16,
+    'label': np.int8,
+}
+
 
 ### -------------------------------
 # 1. Load JSONL Dataset
 ### -------------------------------
 def load_jsonl(filepath):
-    with open(filepath, "r", encoding="utf-8") as f:
-        return [json.loads(line) for line in f]
+    """
+    Yields one song at a time instead of loading the whole corpus.
+    """
+    return iter_jsonl(filepath)
 
 
 
 ### -------------------------------
 # 2. Collect Last Words
 ### -------------------------------
-def collect_last_words(song):
+def collect_last_words(song, vocab=None):
     last_words = []
     for line in song['lines']:
-        if not line['words']:
+        word = last_word(line, vocab)
+        if word is None:
             continue
-        last_word = line['words'][-1]
 
         tempdict = {
-            "text": last_word['text'],
-            "phonemes": last_word['phonemes'],
-            "syllables": last_word['syllables'],
-            "stress": last_word['stress'],
-            "rhyme_ending": last_word['rhyme_ending'],
+            "text": word['text'],
+            "phonemes": word['phonemes'],
+            "syllables": word['syllables'],
+            "stress": word['stress'],
+            "rhyme_ending": word['rhyme_ending'],
             "rhyme_id": line['rhyme_id'],
         }
 
@@ -43,31 +80,205 @@ def collect_last_words(song):
 ### -------------------------------
 # 3. Generate Pairs
 ### -------------------------------
-def generate_pairs(last_words):
-    pairs = []
+class WordPair:
+    """
+    One i<j pair of last words, stored as indices into the song's word table.
+    Supports the old dict keys ('word1_text', 'word2_stress', 'label', ...)
+    so code written against the pair dicts keeps working.
+    """
+    __slots__ = ('words', 'i', 'j', 'label')
+
+    def __init__(self, words, i, j):
+        self.words = words
+        self.i = i
+        self.j = j
+        self.label = 1 if words[i]['rhyme_id'] == words[j]['rhyme_id'] else 0
+
+    @property
+    def word1(self):
+        return self.words[self.i]
+
+    @property
+    def word2(self):
+        return self.words[self.j]
+
+    def __getitem__(self, key):
+        if key == 'label':
+            return self.label
+        if key.startswith('word1_'):
+            return self.words[self.i][key[6:]]
+        if key.startswith('word2_'):
+            return self.words[self.j][key[6:]]
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+
+class PairView:
+    """
+    Lazy view over every i<j pair of a song's last words. Pairs are created
+    while iterating and never stored, so memory grows with the number of
+    words rather than the number of pairs.
+    """
+    __slots__ = ('words',)
+
+    def __init__(self, words):
+        self.words = words
+
+    def __len__(self):
+        n = len(self.words)
+        return n * (n - 1) // 2
+
+    def __iter__(self):
+        return iter_pairs(self.words)
+
+    def rhyme_count(self):
+        """
+        Number of label-1 pairs, counted from rhyme_id group sizes.
+        """
+        sizes = Counter(w['rhyme_id'] for w in self.words)
+        return sum(c * (c - 1) // 2 for c in sizes.values())
+
+    def blocks(self, max_pairs=65536):
+        return iter_pair_blocks(len(self.words), max_pairs)
+
+
+class SampledPairView:
+    """
+    A chosen subset of a song's i<j pairs, held as index arrays in
+    generate_pairs order. Built by generate_pairs in sampling mode.
+    """
+    __slots__ = ('words', 'left', 'right', 'positives')
+
+    def __init__(self, words, left, right, positives):
+        self.words = words
+        self.left = left
+        self.right = right
+        self.positives = positives
+
+    def __len__(self):
+        return len(self.left)
+
+    def __iter__(self):
+        for i, j in zip(self.left.tolist(), self.right.tolist()):
+            yield WordPair(self.words, i, j)
+
+    def rhyme_count(self):
+        return self.positives
+
+    def blocks(self, max_pairs=65536):
+        for start in range(0, len(self.left), max_pairs):
+            yield self.left[start:start + max_pairs], self.right[start:start + max_pairs]
+
+
+def iter_pairs(last_words):
     for i in range(0, len(last_words)):
         for j in range(i+1, len(last_words)):
-            if((last_words[i]['rhyme_id']) == (last_words[j]['rhyme_id'])):
-                label = 1
-            else:
-                label = 0
-            pairs.append({
-                "word1_text": last_words[i]['text'],
-                "word1_phonemes": last_words[i]['phonemes'],
-                "word1_syllables": last_words[i]['syllables'],
-                "word1_stress": last_words[i]['stress'],
-                "word1_rhyme_ending": last_words[i]['rhyme_ending'],
-
-                "word2_text": last_words[j]['text'],
-                "word2_phonemes": last_words[j]['phonemes'],
-                "word2_syllables": last_words[j]['syllables'],
-                "word2_stress": last_words[j]['stress'],
-                "word2_rhyme_ending": last_words[j]['rhyme_ending'],
-
-                "label": label
-            })
-
-    return pairs
+            yield WordPair(last_words, i, j)
+
+
+def song_seed(song, seed=0):
+    """
+    Stable per-song seed, so a song gets the same sample in every run and
+    in every worker process.
+    """
+    key = f"{seed}\t{song.get('artist', '')}\t{song.get('title', '')}"
+    return zlib.crc32(key.encode('utf-8'))
+
+
+def ending_vowel(word):
+    """
+    The stressed vowel that starts the rhyme ending, without its stress
+    digit. Words sharing it sound alike but may not rhyme.
+    """
+    ending = word['rhyme_ending'].split()
+    return ending[0].rstrip('012') if ending else ''
+
+
+def sample_negatives(last_words, count, hard_fraction, rng):
+    """
+    Picks `count` distinct label-0 pairs as (i, j) tuples with i < j.
+    About hard_fraction of them share the stressed vowel of their rhyme
+    endings; the rest are drawn uniformly. Work grows with count, not with
+    the number of pairs in the song.
+    """
+    n = len(last_words)
+    rhyme_ids = [w['rhyme_id'] for w in last_words]
+    chosen = set()
+
+    def take(i, j):
+        if i == j or rhyme_ids[i] == rhyme_ids[j]:
+            return
+        chosen.add((min(i, j), max(i, j)))
+
+    buckets = defaultdict(list)
+    for k, word in enumerate(last_words):
+        buckets[ending_vowel(word)].append(k)
+    hard_words = [k for bucket in buckets.values() if len(bucket) > 1 for k in bucket]
+    hard_target = round(count * hard_fraction)
+    attempts = 0
+    while hard_words and len(chosen) < hard_target and attempts < 20 * hard_target:
+        i = hard_words[rng.integers(len(hard_words))]
+        bucket = buckets[ending_vowel(last_words[i])]
+        take(i, bucket[rng.integers(len(bucket))])
+        attempts += 1
+
+    attempts = 0
+    while len(chosen) < count and attempts < 20 * count:
+        take(int(rng.integers(n)), int(rng.integers(n)))
+        attempts += 1
+
+    if len(chosen) < count:
+        # Dense song: few negatives exist, so pick from all of them
+        rest = [(i, j) for i in range(n) for j in range(i + 1, n)
+                if rhyme_ids[i] != rhyme_ids[j] and (i, j) not in chosen]
+        picks = rng.choice(len(rest), min(count - len(chosen), len(rest)), replace=False)
+        chosen.update(rest[k] for k in picks)
+    return chosen
+
+
+def sample_pairs(last_words, negative_ratio=None, negatives=None, hard_fraction=0.5, seed=0):
+    """
+    Every label-1 pair (found by grouping on rhyme_id) plus a reproducible
+    sample of label-0 pairs: round(negative_ratio * positives) of them, or
+    a fixed `negatives` per song.
+    """
+    groups = defaultdict(list)
+    for k, word in enumerate(last_words):
+        groups[word['rhyme_id']].append(k)
+    positives = [(i, j) for members in groups.values()
+                 for a, i in enumerate(members) for j in members[a + 1:]]
+
+    n = len(last_words)
+    available = n * (n - 1) // 2 - len(positives)
+    if negative_ratio is not None:
+        count = round(negative_ratio * len(positives))
+    else:
+        count = negatives
+    count = min(count, available)
+
+    rng = np.random.default_rng(seed)
+    pairs = positives + list(sample_negatives(last_words, count, hard_fraction, rng)) if count else positives
+    if not pairs:
+        empty = np.zeros(0, dtype=np.int64)
+        return SampledPairView(last_words, empty, empty, 0)
+    keys = np.unique(np.array([i * n + j for i, j in pairs], dtype=np.int64))
+    return SampledPairView(last_words, keys // n, keys % n, len(positives))
+
+
+def generate_pairs(last_words, negative_ratio=None, negatives=None, hard_fraction=0.5, seed=0):
+    """
+    All i<j pairs by default. Given negative_ratio or negatives, returns
+    only the positives plus sampled negatives (see sample_pairs), so the
+    pair count grows with the number of rhymes instead of quadratically.
+    """
+    if negative_ratio is None and negatives is None:
+        return PairView(last_words)
+    return sample_pairs(last_words, negative_ratio, negatives, hard_fraction, seed)
 
 
 ### -------------------------------
@@ -125,6 +336,29 @@ def compute_features(pairs):
     return features
 
 
+def compute_song_features(last_words):
+    """
+    Same features as compute_features(generate_pairs(last_words)), computed
+    as NumPy columns over all i<j pairs without building pair dicts.
+    """
+    return compute_feature_columns(last_words)
+
+
+def iter_song_feature_blocks(last_words, max_pairs=65536, metrics=None, pairs=None):
+    """
+    Lazy version of compute_song_features: yields the columns in blocks of
+    about max_pairs pairs, in generate_pairs order. Pass a pair view from
+    generate_pairs to compute only those pairs.
+    """
+    if len(last_words) < 2:
+        return
+    if pairs is None:
+        pairs = generate_pairs(last_words)
+    words = encode_words(last_words)
+    for left, right in pairs.blocks(max_pairs):
+        yield compute_feature_columns(last_words, left, right, words, metrics)
+
+
 
 ### -------------------------------
 # 5. Store in List
@@ -155,6 +389,28 @@ def save_to_csv(features, output_path):
     print(f"✅ Saved {len(features)} rows to {output_path}")
 
 
+def format_csv_rows(features, header=False):
+    """
+    Renders feature rows as CSV text so they can go through a StreamWriter.
+    """
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=FEATURE_FIELDS)
+    if header:
+        writer.writeheader()
+    writer.writerows(features)
+    return buffer.getvalue()
+
+
+def format_csv_columns(columns):
+    """
+    Renders feature columns as CSV text, one row per pair.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerows(zip(*(columns[name].tolist() for name in FEATURE_FIELDS)))
+    return buffer.getvalue()
+
+
 ### -------------------------------
 # 7. Check Balance
 ### -------------------------------
@@ -164,8 +420,14 @@ def check_balance(features):
         return
 
     labels = [f['label'] for f in features]
-    counts = Counter(labels)
-    
+    print_balance(Counter(labels))
+
+
+def print_balance(counts):
+    if not counts:
+        print("NO FEATURES TO CHECK")
+        return
+
     total = sum(counts.values())
     for label, count in counts.items():
         percentage = (count / total) * 100
@@ -180,40 +442,195 @@ def rhyme_stats_per_song(songs):
     for idx, song in enumerate(songs):
         last_words = collect_last_words(song)
         pairs = generate_pairs(last_words)
-        
-        rhyme_count = sum(1 for p in pairs if p['label'] == 1)
-        non_rhyme_count = len(pairs) - rhyme_count
-        total = len(pairs)
-        
-        rhyme_percent = (rhyme_count / total * 100) if total > 0 else 0
-        
-        print(f"Song {idx+1}: Total pairs={total}, Rhymes={rhyme_count} ({rhyme_percent:.2f}%)")
+        print_song_stats(idx, *song_pair_stats(pairs))
+
+
+def song_pair_stats(pairs):
+    if isinstance(pairs, PairView):
+        return len(pairs), pairs.rhyme_count()
+    rhyme_count = sum(1 for p in pairs if p['label'] == 1)
+    return len(pairs), rhyme_count
+
+
+def print_song_stats(idx, total, rhyme_count):
+    rhyme_percent = (rhyme_count / total * 100) if total > 0 else 0
+
+    print(f"Song {idx+1}: Total pairs={total}, Rhymes={rhyme_count} ({rhyme_percent:.2f}%)")
 
 
 
 ### -------------------------------
-# 8. Main Pipeline
+# 8. Chunk Worker
 ### -------------------------------
-def main():
-    input_path = "./assets/rhyme_annotated.jsonl"
-    output_path = "./assets/rhyme_pairs.csv"
+WORKER_CONFIG = {"format": "csv", "vocab_path": None, "vocab": None, "sampling": None}
+WORKER_METRICS = Metrics()
+
+
+def init_worker(config):
+    WORKER_CONFIG.update(config)
+    if WORKER_CONFIG["vocab_path"]:
+        WORKER_CONFIG["vocab"] = Vocabulary.load(WORKER_CONFIG["vocab_path"])
+
+
+def label_song(raw):
+    """
+    Builds the feature rows for one raw JSONL song.
+    Returns (payload, label_counts, (total pairs, rhymes)), where payload is
+    CSV text or, for the npy format, a dict of feature columns.
+    """
+    metrics = WORKER_METRICS
+    with metrics.stage("json_parse"):
+        song = json.loads(raw)
+    with metrics.stage("collect_last_words"):
+        last_words = collect_last_words(song, WORKER_CONFIG["vocab"])
+    with metrics.stage("pair_generation"):
+        sampling = WORKER_CONFIG["sampling"]
+        if sampling:
+            sampling = dict(sampling, seed=song_seed(song, sampling["seed"]))
+            pairs = generate_pairs(last_words, **sampling)
+        else:
+            pairs = generate_pairs(last_words)
+        stats = song_pair_stats(pairs)
+    with metrics.stage("features"):
+        blocks = list(iter_song_feature_blocks(last_words, metrics=metrics, pairs=pairs))
+    metrics.count("pairs", stats[0])
 
-    songs = load_jsonl(input_path)
-    rhyme_stats_per_song(songs)
-    all_pairs = []
+    label_counts = Counter()
+    for block in blocks:
+        label_counts.update(block['label'].tolist())
 
-    for song in songs:
-        last_words = collect_last_words(song)
-        pairs = generate_pairs(last_words)
-        features = compute_features(pairs)
-        all_pairs.extend(features)
+    if WORKER_CONFIG["format"] == "npy":
+        return merge_columns(blocks), label_counts, stats
+    with metrics.stage("csv_format"):
+        return "".join(format_csv_columns(block) for block in blocks), label_counts, stats
+
+
+def label_chunk(raw_lines):
+    results = [label_song(raw) for raw in raw_lines]
+    return results, WORKER_METRICS.drain()
+
+
+def merge_columns(blocks):
+    blocks = [block for block in blocks if block is not None]
+    if not blocks:
+        return None
+    return {
+        name: np.concatenate([block[name] for block in blocks]).astype(dtype, copy=False)
+        for name, dtype in FEATURE_DTYPES.items()
+    }
 
-    check_balance(all_pairs)
-    save_to_csv(all_pairs, output_path)
 
+### -------------------------------
+# 9. Main Pipeline
+### -------------------------------
+def open_writer(args):
+    if args.format == "npy":
+        return ColumnarWriter(args.output, FEATURE_DTYPES, args.chunk_rows, args.checkpoint)
+    return StreamWriter(args.output, args.checkpoint, args.flush_every)
 
 
+def main():
+    parser = argparse.ArgumentParser(description="Build rhyme pair features")
+    parser.add_argument("--input", default="./assets/rhyme_annotated.jsonl")
+    parser.add_argument("--output", default="./assets/rhyme_pairs.csv")
+    parser.add_argument("--format", choices=["csv", "npy"], default="csv",
+                        help="csv text, or a directory of typed .npy columns plus schema.json")
+    parser.add_argument("--checkpoint", default=None,
+                        help="Resume file; an interrupted run continues from the last flushed song "
+                             "(for --format npy, the last written part)")
+    parser.add_argument("--flush-every", type=int, default=100)
+    parser.add_argument("--chunk-rows", type=int, default=1_000_000,
+                        help="Rows per .npy part")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Label song chunks in N processes; output order is unchanged")
+    parser.add_argument("--chunk-size", type=int, default=16)
+    parser.add_argument("--vocab", default=None,
+                        help="Vocabulary file for songs stored as word_ids")
+    parser.add_argument("--cache", default=None,
+                        help="SQLite cache of feature rows; unchanged songs are not re-labelled")
+    sampling = parser.add_mutually_exclusive_group()
+    sampling.add_argument("--negative-ratio", type=float, default=None,
+                          help="Keep every rhyming pair plus this many non-rhyming pairs per rhyming pair")
+    sampling.add_argument("--negatives", type=int, default=None,
+                          help="Keep every rhyming pair plus this many non-rhyming pairs per song")
+    parser.add_argument("--hard-fraction", type=float, default=0.5,
+                        help="Share of sampled negatives whose rhyme endings have the same stressed vowel")
+    parser.add_argument("--seed", type=int, default=0, help="Sampling seed; the same seed gives the same pairs")
+    add_metrics_arguments(parser)
+    add_dedup_arguments(parser)
+    add_selection_arguments(parser)
+    args = parser.parse_args()
+
+    if args.format == "npy" and args.output.endswith(".csv"):
+        args.output = args.output[:-len(".csv")] + ".npy"
+
+    sampling = None
+    if args.negative_ratio is not None or args.negatives is not None:
+        sampling = {
+            "negative_ratio": args.negative_ratio,
+            "negatives": args.negatives,
+            "hard_fraction": args.hard_fraction,
+            "seed": args.seed,
+        }
 
+    cache = None
+    if args.cache:
+        params = {"format": args.format}
+        if sampling:
+            params["sampling"] = sampling
+        vocab = Vocabulary.load(args.vocab) if args.vocab else None
+        cache = AnnotationCache(args.cache, "labeller", params, vocab)
+
+    skip = dedup_skip(parser, args)
+    spans = selected_spans(parser, args)
+    if spans is not None and args.checkpoint:
+        parser.error("--song/--select runs cannot be resumed; drop --checkpoint")
+    if spans is not None and skip:
+        spans = [span for span in spans if span[0] not in skip]
+    metrics = Metrics()
+    with profiled(metrics, args.profile, args.trace_memory), metrics.stage("total"):
+        with open_writer(args) as writer:
+            # Songs are streamed in chunks; only the label counts are kept,
+            # in the writer so they survive a resume
+            label_counts = writer.totals
+            # Number songs on from those the checkpoint recorded as written
+            song_idx = writer.records
+            header_written = writer.resumed or args.format != "csv"
+            if writer.resumed:
+                print(f"Resuming from byte {writer.resume_offset} of {args.input}")
+
+            config = {"format": args.format, "vocab_path": args.vocab, "sampling": sampling}
+            songs = map_songs(label_chunk, args.input, writer.resume_offset, args.workers,
+                              args.chunk_size, init_worker, (config,), cache, metrics, skip, spans)
+            for results, offset, count in songs:
+                payloads = []
+                for payload, counts, (total, rhyme_count) in results:
+                    print_song_stats(song_idx, total, rhyme_count)
+                    song_idx += 1
+                    payloads.append(payload)
+                    label_counts.update(counts)
+
+                if args.format == "npy":
+                    payload = merge_columns(payloads)
+                else:
+                    payload = "".join(payloads)
+
+                if payload and not header_written:
+                    payload = format_csv_rows([], header=True) + payload
+                    header_written = True
+                with metrics.stage("write"):
+                    writer.write(payload, offset, count)
+
+    if cache:
+        cache.close()
+    row_count = sum(label_counts.values())
+    print_balance(label_counts)
+    if row_count:
+        print(f"✅ Saved {row_count} rows to {args.output}")
+    else:
+        print("NO FEATURES TO SAVE")
+    if args.metrics_out:
+        dump_metrics(metrics, args.metrics_out, "labeller")
 
 
 ### -------------------------------
@@ -1,14 +1,26 @@
+import argparse
 import json
-from collections import defaultdict
+import sys
+from collections import OrderedDict
 from itertools import product
 from string import ascii_uppercase
 
+from jsonl_stream import StreamWriter, iter_jsonl
+from metrics import Metrics, add_metrics_arguments, dump_metrics, profiled
+from annotation_cache import AnnotationCache
+from dedup import add_dedup_arguments, dedup_skip
+from offset_index import add_selection_arguments, selected_spans
+from parallel import map_songs
+from vocabulary import Vocabulary, last_word
+
 ### -------------------------------
 # 1. Load JSONL Dataset
 ### -------------------------------
 def load_jsonl(filepath):
-    with open(filepath, "r", encoding="utf-8") as f:
-        return [json.loads(line) for line in f]
+    """
+    Yields one song at a time instead of loading the whole corpus.
+    """
+    return iter_jsonl(filepath)
 
 
 ### -------------------------------
@@ -43,38 +55,140 @@ def generate_rhyme_group():
 
 
 ### -------------------------------
-# 4. Detect Rhymes for a Song
+# 4. Rhyme Group Suffix Index
 ### -------------------------------
-def detect_rhyme_groups(song, min_match_phonemes=2):
-    rhyme_groups = {}  # key: rhyme_ending tuple, value: group ID (A, B, C...)
-    rhyme_group_gen = generate_rhyme_group()
+class RhymeSuffixIndex:
+    """
+    Maps the trailing `min_match_phonemes` phonemes of a rhyme ending to the
+    group that first registered them.
 
-    # Map rhyme endings to group labels
-    for line in song["lines"]:
-        if not line["words"]:
-            continue
-        last_word = line["words"][-1]
-        rhyme_key = tuple(last_word["rhyme_ending"].split())
+    Two endings score >= min_match_phonemes in phoneme_similarity exactly when
+    their last min_match_phonemes phonemes are equal, so the first group whose
+    key shares that suffix is the one a linear scan would have picked.
+    Endings shorter than the suffix can never match and are not indexed.
 
-        # Try to find an existing group
-        assigned = False
-        for key, group in rhyme_groups.items():
-            if phoneme_similarity(rhyme_key, key) >= min_match_phonemes:
-                line["rhyme_id"] = group
-                assigned = True
+    touch() and expire() support windowed grouping: entries are kept in
+    least-recently-used order, so expiring old groups only looks at the
+    ones actually being dropped.
+    """
+
+    def __init__(self, min_match_phonemes=2):
+        self.min_match_phonemes = min_match_phonemes
+        self.groups = {}  # key: trailing phoneme tuple, value: group ID
+        self.last_used = OrderedDict()  # key: trailing phoneme tuple, value: line number
+
+    def suffix(self, rhyme_key):
+        if self.min_match_phonemes <= 0:
+            return ()
+        if len(rhyme_key) < self.min_match_phonemes:
+            return None
+        return tuple(rhyme_key[-self.min_match_phonemes:])
+
+    def lookup(self, rhyme_key):
+        suffix = self.suffix(rhyme_key)
+        if suffix is None:
+            return None
+        return self.groups.get(suffix)
+
+    def add(self, rhyme_key, group_id):
+        suffix = self.suffix(rhyme_key)
+        if suffix is not None and suffix not in self.groups:
+            self.groups[suffix] = group_id
+
+    def touch(self, rhyme_key, line_no):
+        suffix = self.suffix(rhyme_key)
+        if suffix in self.groups:
+            self.last_used[suffix] = line_no
+            self.last_used.move_to_end(suffix)
+
+    def expire(self, oldest_line):
+        """
+        Drops every group last used before line oldest_line.
+        """
+        while self.last_used:
+            suffix, line_no = next(iter(self.last_used.items()))
+            if line_no >= oldest_line:
                 break
+            del self.last_used[suffix]
+            del self.groups[suffix]
+
+    def clear(self):
+        self.groups.clear()
+        self.last_used.clear()
+
+    def __len__(self):
+        return len(self.groups)
+
+
+### -------------------------------
+# 5. Streaming Rhyme Grouper
+### -------------------------------
+class RhymeGrouper:
+    """
+    Assigns rhyme groups one line at a time.
+
+    With window=N a group expires once N lines pass without a line joining
+    it, and with stanza_breaks=True a line with no words closes every open
+    group. Memory and per-line work then depend on the window, not on the
+    length of the input. Labels keep counting up across expiries, so a
+    label never changes meaning within a song or transcript.
+    """
+
+    def __init__(self, min_match_phonemes=2, window=None, stanza_breaks=False, vocab=None):
+        self.index = RhymeSuffixIndex(min_match_phonemes)
+        self.labels = generate_rhyme_group()
+        self.window = window
+        self.stanza_breaks = stanza_breaks
+        self.vocab = vocab
+        self.line_no = 0
+
+    def add_line(self, line):
+        """
+        Sets line["rhyme_id"] and returns it, or returns None for a line
+        without words.
+        """
+        self.line_no += 1
+        word = last_word(line, self.vocab)
+        if word is None:
+            if self.stanza_breaks:
+                self.index.clear()
+            return None
+        rhyme_key = tuple(word["rhyme_ending"].split())
+
+        if self.window is not None:
+            self.index.expire(self.line_no - self.window)
+
+        # Try to find an existing group
+        group_id = self.index.lookup(rhyme_key)
 
         # If no match, assign new group
-        if not assigned:
-            group_id = next(rhyme_group_gen)
-            rhyme_groups[rhyme_key] = group_id
-            line["rhyme_id"] = group_id
+        if group_id is None:
+            group_id = next(self.labels)
+            self.index.add(rhyme_key, group_id)
+        if self.window is not None:
+            self.index.touch(rhyme_key, self.line_no)
 
+        line["rhyme_id"] = group_id
+        return group_id
+
+
+### -------------------------------
+# 6. Detect Rhymes for a Song
+### -------------------------------
+def detect_rhyme_groups(song, min_match_phonemes=2, vocab=None, window=None, stanza_breaks=False):
+    """
+    Labels each line with a rhyme_id. Songs stored as "word_ids" need the
+    Vocabulary they were encoded with. By default groups stay open for the
+    whole song; see RhymeGrouper for window and stanza_breaks.
+    """
+    grouper = RhymeGrouper(min_match_phonemes, window, stanza_breaks, vocab)
+    for line in song["lines"]:
+        grouper.add_line(line)
     return song
 
 
 ### -------------------------------
-# 5. Save Output JSONL
+# 7. Save Output JSONL
 ### -------------------------------
 def save_jsonl(data, filepath):
     with open(filepath, "w", encoding="utf-8") as f:
@@ -83,21 +197,128 @@ def save_jsonl(data, filepath):
 
 
 ### -------------------------------
-# 6. Main Pipeline
+# 8. Chunk Worker
+### -------------------------------
+WORKER_CONFIG = {"min_match_phonemes": 2, "window": None, "stanza_breaks": False,
+                 "vocab_path": None, "vocab": None}
+WORKER_METRICS = Metrics()
+
+
+def init_worker(config):
+    WORKER_CONFIG.update(config)
+    if WORKER_CONFIG["vocab_path"]:
+        WORKER_CONFIG["vocab"] = Vocabulary.load(WORKER_CONFIG["vocab_path"])
+
+
+def annotate_chunk(raw_lines):
+    """
+    Annotates a chunk of raw JSONL lines and returns (one output line per
+    song, stage metrics). Runs inside pool workers, so it only depends on
+    WORKER_CONFIG.
+    """
+    out = []
+    for raw in raw_lines:
+        with WORKER_METRICS.stage("json_parse"):
+            song = json.loads(raw)
+        with WORKER_METRICS.stage("rhyme_grouping"):
+            annotated_song = detect_rhyme_groups(song, WORKER_CONFIG["min_match_phonemes"], WORKER_CONFIG["vocab"],
+                                                 WORKER_CONFIG["window"], WORKER_CONFIG["stanza_breaks"])
+        with WORKER_METRICS.stage("json_dump"):
+            out.append(json.dumps(annotated_song) + "\n")
+        WORKER_METRICS.count("lines", len(song["lines"]))
+    return out, WORKER_METRICS.drain()
+
+
+### -------------------------------
+# 9. Line Stream
+### -------------------------------
+def annotate_line_stream(infile, outfile, grouper):
+    """
+    Reads one JSON line record per input line (the schema of a song's
+    "lines" entries) and writes it back with its rhyme_id as soon as it
+    arrives. A blank input line counts as a line without words.
+    """
+    for raw in infile:
+        line = json.loads(raw) if raw.strip() else {"text": "", "words": []}
+        grouper.add_line(line)
+        outfile.write(json.dumps(line) + "\n")
+        outfile.flush()
+
+
+### -------------------------------
+# 10. Main Pipeline
 ### -------------------------------
 def main():
-    input_path = "preprocessed.jsonl"
-    output_path = "rhyme_annotated.jsonl"
+    parser = argparse.ArgumentParser(description="Annotate line-final rhyme groups")
+    parser.add_argument("--input", default="preprocessed.jsonl")
+    parser.add_argument("--output", default="rhyme_annotated.jsonl")
+    parser.add_argument("--checkpoint", default=None,
+                        help="Resume file; an interrupted run continues from the last flushed song")
+    parser.add_argument("--flush-every", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Annotate song chunks in N processes; output order is unchanged")
+    parser.add_argument("--chunk-size", type=int, default=64)
+    parser.add_argument("--vocab", default=None,
+                        help="Vocabulary file for songs stored as word_ids")
+    parser.add_argument("--min-match", type=int, default=2)
+    parser.add_argument("--window", type=int, default=None,
+                        help="Close a rhyme group after N lines without a new member")
+    parser.add_argument("--stanza-breaks", action="store_true",
+                        help="Close every rhyme group at a line without words")
+    parser.add_argument("--stream", action="store_true",
+                        help="Annotate line records one at a time (use - for stdin/stdout)")
+    parser.add_argument("--cache", default=None,
+                        help="SQLite cache of annotated songs; unchanged songs are not re-annotated")
+    add_metrics_arguments(parser)
+    add_dedup_arguments(parser)
+    add_selection_arguments(parser)
+    args = parser.parse_args()
+
+    if args.min_match < 1:
+        parser.error("--min-match must be at least 1")
+
+    if args.stream:
+        vocab = Vocabulary.load(args.vocab) if args.vocab else None
+        grouper = RhymeGrouper(args.min_match, args.window, args.stanza_breaks, vocab)
+        infile = sys.stdin if args.input == "-" else open(args.input, "r", encoding="utf-8")
+        outfile = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+        with infile, outfile:
+            annotate_line_stream(infile, outfile, grouper)
+        return
+
+    config = {"min_match_phonemes": args.min_match, "window": args.window,
+              "stanza_breaks": args.stanza_breaks, "vocab_path": args.vocab}
+    cache = None
+    if args.cache:
+        params = {"min_match_phonemes": args.min_match}
+        if args.window is not None or args.stanza_breaks:
+            params.update(window=args.window, stanza_breaks=args.stanza_breaks)
+        vocab = Vocabulary.load(args.vocab) if args.vocab else None
+        cache = AnnotationCache(args.cache, "rhyme_detector", params, vocab)
 
-    songs = load_jsonl(input_path)
-    annotated_songs = []
+    skip = dedup_skip(parser, args)
+    spans = selected_spans(parser, args)
+    if spans is not None and args.checkpoint:
+        parser.error("--song/--select runs cannot be resumed; drop --checkpoint")
+    if spans is not None and skip:
+        spans = [span for span in spans if span[0] not in skip]
+    metrics = Metrics()
+    with profiled(metrics, args.profile, args.trace_memory), metrics.stage("total"):
+        with StreamWriter(args.output, args.checkpoint, args.flush_every) as writer:
+            if writer.resumed:
+                print(f"Resuming from byte {writer.resume_offset} of {args.input}")
 
-    for song in songs:
-        annotated_song = detect_rhyme_groups(song)
-        annotated_songs.append(annotated_song)
+            songs = map_songs(annotate_chunk, args.input, writer.resume_offset, args.workers,
+                              args.chunk_size, init_worker, (config,), cache, metrics, skip, spans)
+            for texts, offset, count in songs:
+                with metrics.stage("write"):
+                    writer.write("".join(texts), offset, count)
 
-    save_jsonl(annotated_songs, output_path)
-    print(f"Saved annotated songs to {output_path}")
+    if cache:
+        cache.close()
+    print(f"Saved annotated songs to {args.output}")
+    if args.metrics_out:
+        dump_metrics(metrics, args.metrics_out, "rhyme_detector")
 
 
 ### -------------------------------
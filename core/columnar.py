@@ -0,0 +1,184 @@
+import csv
+import json
+import os
+from collections import Counter
+
+import numpy as np
+
+from jsonl_stream import load_checkpoint, save_checkpoint
+
+
+SCHEMA_FILE = "schema.json"
+
+
+### -------------------------------
+# 1. Chunked .npy Writer
+### -------------------------------
+class ColumnarWriter:
+    """
+    Streams feature columns into a directory of typed .npy parts:
+
+        rhyme_pairs.npy/
+            schema.json                 column names, dtypes, parts, totals, complete
+            part-00000.exact_match.npy
+            part-00000.label.npy
+            ...
+
+    Columns are buffered until `chunk_rows` rows are pending, then written
+    as one part and schema.json is rewritten. With a checkpoint path, each
+    part also records how far the input has got, in the same checkpoint
+    file StreamWriter uses (its output_offset counts parts here), so an
+    interrupted run can pick up from `resume_offset`. Parts written after
+    the last checkpoint are dropped. close() marks the schema complete and
+    removes the checkpoint. `totals` and `records` are saved and restored
+    as with StreamWriter.
+    """
+
+    def __init__(self, directory, dtypes, chunk_rows=1_000_000, checkpoint_path=None):
+        self.directory = directory
+        self.checkpoint_path = checkpoint_path
+        self.dtypes = dtypes
+        self.chunk_rows = chunk_rows
+        self.buffer = {name: [] for name in dtypes}
+        self.pending_rows = 0
+        self.input_offset = 0
+        self.records = 0
+        self.parts = []
+        self.totals = Counter()
+
+        os.makedirs(directory, exist_ok=True)
+        schema_path = os.path.join(directory, SCHEMA_FILE)
+        checkpoint = load_checkpoint(checkpoint_path)
+        schema = None
+        if checkpoint["output_offset"] and os.path.exists(schema_path):
+            with open(schema_path, "r", encoding="utf-8") as f:
+                schema = json.load(f)
+        if schema is not None and not schema.get("complete"):
+            self.parts = schema["parts"][:checkpoint["output_offset"]]
+            self.totals.update({key: count for key, count in checkpoint.get("totals", [])})
+            self.records = checkpoint.get("records", 0)
+            self.resume_offset = checkpoint["input_offset"]
+        else:
+            self.resume_offset = 0
+
+        kept = {part["name"] for part in self.parts}
+        for name in os.listdir(directory):
+            if name.startswith("part-") and name.split(".")[0] not in kept:
+                os.remove(os.path.join(directory, name))
+        if self.parts:
+            self.save_schema()
+        elif os.path.exists(schema_path):
+            os.remove(schema_path)
+
+    @property
+    def resumed(self):
+        return self.resume_offset > 0
+
+    @property
+    def rows(self):
+        return sum(part["rows"] for part in self.parts) + self.pending_rows
+
+    def write(self, columns, input_offset=None, records=1):
+        if input_offset is not None:
+            self.input_offset = input_offset
+        self.records += records
+        if columns:
+            for name in self.dtypes:
+                self.buffer[name].append(columns[name])
+            self.pending_rows += len(columns[next(iter(self.dtypes))])
+        if self.pending_rows >= self.chunk_rows:
+            self.flush()
+
+    def flush(self):
+        if self.pending_rows == 0:
+            return
+        part = f"part-{len(self.parts):05d}"
+        for name, dtype in self.dtypes.items():
+            values = np.concatenate(self.buffer[name]).astype(dtype, copy=False)
+            np.save(os.path.join(self.directory, f"{part}.{name}.npy"), values)
+            self.buffer[name] = []
+        self.parts.append({"name": part, "rows": self.pending_rows, "input_offset": self.input_offset})
+        self.pending_rows = 0
+        self.save_schema()
+        if self.checkpoint_path:
+            save_checkpoint(self.checkpoint_path, self.input_offset, len(self.parts), self.totals, self.records)
+
+    def save_schema(self, complete=False):
+        schema = {
+            "columns": [{"name": name, "dtype": np.dtype(dtype).str} for name, dtype in self.dtypes.items()],
+            "parts": self.parts,
+            "rows": sum(part["rows"] for part in self.parts),
+            "totals": [[key, count] for key, count in self.totals.items()],
+            "complete": complete,
+        }
+        schema_path = os.path.join(self.directory, SCHEMA_FILE)
+        with open(schema_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(schema, f, indent=2)
+        os.replace(schema_path + ".tmp", schema_path)
+
+    def close(self):
+        self.flush()
+        self.save_schema(complete=True)
+        # A finished run has nothing to resume
+        if self.checkpoint_path and os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # On error, keep the parts flushed so far so the run can be resumed
+        if exc_type is None:
+            self.close()
+        return False
+
+
+### -------------------------------
+# 2. Memory-Mapped Reader
+### -------------------------------
+class ColumnarReader:
+    """
+    Opens a directory written by ColumnarWriter. Parts are memory-mapped,
+    so only the pages that are actually touched get read.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, SCHEMA_FILE), "r", encoding="utf-8") as f:
+            self.schema = json.load(f)
+        self.columns = [column["name"] for column in self.schema["columns"]]
+
+    def __len__(self):
+        return self.schema["rows"]
+
+    def iter_parts(self, columns=None):
+        """
+        Yields one dict of memory-mapped arrays per part.
+        """
+        columns = columns or self.columns
+        for part in self.schema["parts"]:
+            yield {
+                name: np.load(os.path.join(self.directory, f"{part['name']}.{name}.npy"), mmap_mode="r")
+                for name in columns
+            }
+
+    def column(self, name):
+        """
+        Returns a whole column. A single part stays memory-mapped; several
+        parts are concatenated into memory.
+        """
+        parts = [part[name] for part in self.iter_parts([name])]
+        if len(parts) == 1:
+            return parts[0]
+        if not parts:
+            dtype = next(c["dtype"] for c in self.schema["columns"] if c["name"] == name)
+            return np.zeros(0, dtype=dtype)
+        return np.concatenate(parts)
+
+    def export_csv(self, output_path):
+        with open(output_path, mode='w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(self.columns)
+            for part in self.iter_parts():
+                writer.writerows(zip(*(part[name].tolist() for name in self.columns)))
+        print(f"✅ Exported {len(self)} rows to {output_path}")
@@ -0,0 +1,284 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+import zlib
+
+import numpy as np
+
+
+WORD_PATTERN = re.compile(r"[a-z0-9']+")
+MERSENNE = np.uint64((1 << 61) - 1)
+FINGERPRINT_BYTES = 65536
+
+
+### -------------------------------
+# 1. Shingles
+### -------------------------------
+def song_lines(song):
+    """
+    Lyric lines of a cleaned {"lyrics": [...]} record or of a preprocessed
+    or annotated {"lines": [{"text": ...}]} song.
+    """
+    if "lyrics" in song:
+        return song["lyrics"]
+    return [line["text"] for line in song.get("lines", [])]
+
+
+def shingles(lines, k=5):
+    """
+    crc32 hashes of every k-word window of the song, as a uint32 array.
+    Songs shorter than k words give one shingle.
+    """
+    words = WORD_PATTERN.findall(" ".join(lines).lower())
+    if not words:
+        return np.zeros(0, dtype=np.uint32)
+    windows = {" ".join(words[i:i + k]) for i in range(max(1, len(words) - k + 1))}
+    return np.fromiter((zlib.crc32(w.encode("utf-8")) for w in windows), dtype=np.uint32, count=len(windows))
+
+
+### -------------------------------
+# 2. MinHash Signatures
+### -------------------------------
+def hash_params(num_perm, seed=0):
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, 1 << 61, num_perm, dtype=np.uint64)
+    b = rng.integers(0, 1 << 61, num_perm, dtype=np.uint64)
+    return a, b
+
+
+def minhash_block(shingle_sets, a, b):
+    """
+    MinHash signatures for a list of non-empty shingle arrays, computed for
+    the whole block at once. Each permutation is h(x) = (a*x + b) mod p
+    with p = 2^61 - 1; x < 2^32 and a is split in two 32-bit halves so no
+    product overflows uint64.
+    """
+    x = np.concatenate(shingle_sets).astype(np.uint64)[:, None]
+    a_hi = a >> np.uint64(32)
+    a_lo = a & np.uint64(0xFFFFFFFF)
+    # a*x = a_hi*x*2^32 + a_lo*x; 2^61 = 1 (mod p) folds the high part
+    hi = (a_hi * x) % MERSENNE
+    hi = ((hi << np.uint64(32)) & MERSENNE) + (hi >> np.uint64(29))
+    hashed = (hi + a_lo * x % MERSENNE + b) % MERSENNE
+    starts = np.cumsum([0] + [len(s) for s in shingle_sets[:-1]])
+    return np.minimum.reduceat(hashed, starts, axis=0)
+
+
+def minhash_signatures(shingle_sets, num_perm=128, seed=0, block_shingles=20_000):
+    """
+    (songs, num_perm) uint64 signatures. Songs without shingles get an
+    all-ones row, so they only match other empty songs.
+    """
+    a, b = hash_params(num_perm, seed)
+    signatures = np.full((len(shingle_sets), num_perm), np.iinfo(np.uint64).max, dtype=np.uint64)
+    block = []
+    rows = []
+    pending = 0
+    for row, shingle_set in enumerate(shingle_sets):
+        if not len(shingle_set):
+            continue
+        block.append(shingle_set)
+        rows.append(row)
+        pending += len(shingle_set)
+        if pending >= block_shingles:
+            signatures[rows] = minhash_block(block, a, b)
+            block, rows, pending = [], [], 0
+    if block:
+        signatures[rows] = minhash_block(block, a, b)
+    return signatures
+
+
+### -------------------------------
+# 3. LSH Banding and Clusters
+### -------------------------------
+def find_root(parent, i):
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+
+def lsh_clusters(signatures, bands=16, threshold=0.7):
+    """
+    Splits each signature into `bands` bands and buckets songs whose band
+    matches exactly. Every song in a bucket is compared with the bucket's
+    first song and joined to it (union-find) when their estimated Jaccard
+    similarity is at least threshold. Returns (parent index per song,
+    similarity to the song it was joined with).
+    """
+    count, num_perm = signatures.shape
+    rows = num_perm // bands
+    parent = np.arange(count)
+    similarity = np.zeros(count)
+    mix = np.random.default_rng(1).integers(1, 1 << 63, rows, dtype=np.uint64) | np.uint64(1)
+
+    for band in range(bands):
+        part = signatures[:, band * rows:(band + 1) * rows]
+        keys = (part * mix).sum(axis=1)  # wraps mod 2^64
+        order = np.argsort(keys, kind="stable")
+        sorted_keys = keys[order]
+        starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+        sizes = np.diff(np.r_[starts, count])
+        for start, size in zip(starts[sizes > 1].tolist(), sizes[sizes > 1].tolist()):
+            members = np.sort(order[start:start + size])
+            leader = members[0]
+            scores = (signatures[members[1:]] == signatures[leader]).mean(axis=1)
+            for member, score in zip(members[1:].tolist(), scores.tolist()):
+                if score < threshold:
+                    continue
+                root_a, root_b = find_root(parent, leader), find_root(parent, member)
+                if root_a != root_b:
+                    # The earlier song stays the root, so it is the one kept
+                    parent[max(root_a, root_b)] = min(root_a, root_b)
+                similarity[member] = max(similarity[member], score)
+
+    roots = np.array([find_root(parent, i) for i in range(count)], dtype=np.int64)
+    return roots, similarity
+
+
+### -------------------------------
+# 4. Manifest
+### -------------------------------
+def file_fingerprint(f, size):
+    """
+    Hash of `size` and of the first and last 64 KiB of the file's first
+    `size` bytes.
+    """
+    digest = hashlib.blake2b(str(size).encode("ascii"), digest_size=8)
+    f.seek(0)
+    digest.update(f.read(min(size, FINGERPRINT_BYTES)))
+    f.seek(max(0, size - FINGERPRINT_BYTES))
+    digest.update(f.read(min(size, FINGERPRINT_BYTES)))
+    return digest.hexdigest()
+
+
+def source_info(input_path):
+    """
+    Path, size and file_fingerprint of the file a manifest is built from.
+    Offsets only mean something for that exact file.
+    """
+    size = os.path.getsize(input_path)
+    with open(input_path, "rb") as f:
+        fingerprint = file_fingerprint(f, size)
+    return {"path": input_path, "size": size, "fingerprint": fingerprint}
+
+
+def build_manifest(input_path, k=5, num_perm=128, bands=16, threshold=0.7, seed=0):
+    """
+    Returns one entry per song: its byte offset in input_path, artist and
+    title, whether to keep it, and the offset of the song it duplicates.
+    The earliest song of each cluster is kept.
+    """
+    entries = []
+    shingle_sets = []
+    with open(input_path, "rb") as f:
+        offset = 0
+        for raw in f:
+            start = offset
+            offset += len(raw)
+            if not raw.strip():
+                continue
+            song = json.loads(raw)
+            entries.append({
+                "offset": start,
+                "artist": song.get("artist", ""),
+                "title": song.get("title", song.get("song", "")),
+            })
+            shingle_sets.append(shingles(song_lines(song), k))
+
+    signatures = minhash_signatures(shingle_sets, num_perm, seed)
+    roots, similarity = lsh_clusters(signatures, bands, threshold)
+    for idx, entry in enumerate(entries):
+        root = int(roots[idx])
+        entry["keep"] = root == idx
+        entry["duplicate_of"] = None if root == idx else entries[root]["offset"]
+        entry["similarity"] = round(float(similarity[idx]), 3)
+    return entries
+
+
+def save_manifest(entries, path, source):
+    """
+    Writes a {"source": source_info(...)} header line, then one line per
+    song.
+    """
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(json.dumps({"source": source}, ensure_ascii=False) + "\n")
+        for entry in entries:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+
+def load_drop_offsets(path, input_path):
+    """
+    Byte offsets of the songs a manifest drops. Raises ValueError when
+    input_path is not the file the manifest was built from.
+    """
+    drop = set()
+    with open(path, "r", encoding="utf-8") as f:
+        header = json.loads(f.readline() or "{}")
+        if "source" not in header:
+            raise ValueError(f"{path} has no source header; rebuild it with dedup.py")
+        source = header["source"]
+        actual = source_info(input_path)
+        if (source["size"], source["fingerprint"]) != (actual["size"], actual["fingerprint"]):
+            raise ValueError(f"{path} was built from {source['path']} ({source['size']} bytes), "
+                             f"which does not match {input_path} ({actual['size']} bytes)")
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                if not entry["keep"]:
+                    drop.add(entry["offset"])
+    return drop
+
+
+def add_dedup_arguments(parser):
+    parser.add_argument("--dedup-manifest", default=None,
+                        help="Skip the songs this dedup.py manifest drops (built from this --input)")
+
+
+def dedup_skip(parser, args):
+    """
+    Offsets to skip for --dedup-manifest, or None without one. A manifest
+    built from a different --input is a usage error.
+    """
+    if not args.dedup_manifest:
+        return None
+    try:
+        return load_drop_offsets(args.dedup_manifest, args.input)
+    except ValueError as e:
+        parser.error(str(e))
+
+
+### -------------------------------
+# 5. Main
+### -------------------------------
+def main():
+    parser = argparse.ArgumentParser(description="Find near-duplicate songs with MinHash and LSH")
+    parser.add_argument("--input", default="./assets/lyrics_dataset_fixed.jsonl")
+    parser.add_argument("--output", default="dedup_manifest.jsonl")
+    parser.add_argument("--shingle", type=int, default=5, help="Words per shingle")
+    parser.add_argument("--num-perm", type=int, default=128, help="MinHash permutations")
+    parser.add_argument("--bands", type=int, default=16, help="LSH bands; num-perm must divide evenly")
+    parser.add_argument("--threshold", type=float, default=0.7,
+                        help="Estimated Jaccard similarity needed to call two songs duplicates")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.num_perm % args.bands:
+        parser.error("--num-perm must be a multiple of --bands")
+
+    source = source_info(args.input)
+    entries = build_manifest(args.input, args.shingle, args.num_perm, args.bands, args.threshold, args.seed)
+    save_manifest(entries, args.output, source)
+
+    dropped = [e for e in entries if not e["keep"]]
+    clusters = {e["duplicate_of"] for e in dropped}
+    print(f"{len(entries)} songs, {len(clusters)} duplicate clusters, {len(dropped)} songs dropped")
+    for entry in dropped[:20]:
+        print(f"  drop {entry['artist']} - {entry['title']} (similarity {entry['similarity']})")
+    print(f"Saved manifest to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+from contextlib import nullcontext
+
+import numpy as np
+
+
+### -------------------------------
+# 1. Encode a Song's Words Once
+### -------------------------------
+def intern_strings(values):
+    """
+    Returns (ids, uniques) where uniques[ids[k]] == values[k].
+    """
+    table = {}
+    ids = np.empty(len(values), dtype=np.int64)
+    for k, value in enumerate(values):
+        ids[k] = table.setdefault(value, len(table))
+    return ids, list(table)
+
+
+def encode_words(last_words):
+    """
+    Turns the per-word dicts from collect_last_words into integer arrays,
+    so every word is read once no matter how many pairs it appears in.
+    """
+    endings = [w['rhyme_ending'].lower().strip() for w in last_words]
+    phonemes = [''.join(w.get('phonemes') or []) for w in last_words]
+    stresses = [w.get('stress') or '' for w in last_words]
+
+    ending_ids, _ = intern_strings(endings)
+    phoneme_ids, phoneme_strings = intern_strings(phonemes)
+    stress_ids, stress_strings = intern_strings(stresses)
+    rhyme_ids, _ = intern_strings([w['rhyme_id'] for w in last_words])
+
+    return {
+        'ending_id': ending_ids,
+        'ending_length': np.array([len(e) for e in endings], dtype=np.int64),
+        'phoneme_id': phoneme_ids,
+        'phoneme_strings': phoneme_strings,
+        'stress_id': stress_ids,
+        'stress_strings': stress_strings,
+        'syllables': np.array([int(w.get('syllables') or 0) for w in last_words], dtype=np.int64),
+        'rhyme_id': rhyme_ids,
+    }
+
+
+### -------------------------------
+# 2. Batched Levenshtein
+### -------------------------------
+def encode_chars(strings):
+    lengths = np.array([len(s) for s in strings], dtype=np.int64)
+    width = int(lengths.max()) if len(strings) else 0
+    codes = np.full((len(strings), width), -1, dtype=np.int64)
+    for k, s in enumerate(strings):
+        codes[k, :len(s)] = [ord(c) for c in s]
+    return codes, lengths
+
+
+def levenshtein_pairs(codes, lengths, left, right):
+    """
+    Edit distance between strings codes[left[p]] and codes[right[p]] for
+    every p at once. Each DP row is one vectorised step over all pairs; the
+    insertion chain along a row is a running minimum.
+    """
+    count = len(left)
+    width = codes.shape[1]
+    if count == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    a = codes[left]
+    b = codes[right]
+    len_a = lengths[left]
+    len_b = lengths[right]
+    cols = np.arange(width + 1, dtype=np.int64)
+    rows = np.arange(count)
+
+    prev = np.broadcast_to(cols, (count, width + 1)).copy()
+    distance = len_b.copy()  # strings of length 0 in a
+
+    for i in range(1, width + 1):
+        substitute = prev[:, :-1] + (a[:, i - 1:i] != b)
+        step = np.empty_like(prev)
+        step[:, 0] = i
+        step[:, 1:] = np.minimum(prev[:, 1:] + 1, substitute)
+        cur = np.minimum.accumulate(step - cols, axis=1) + cols
+
+        done = len_a == i
+        distance[done] = cur[rows[done], len_b[done]]
+        prev = cur
+
+    return distance
+
+
+def similarity_pairs(strings, left, right):
+    """
+    1 - distance / max_len for each pair, 0.0 when either string is empty.
+    Distances are computed per unique string pair only.
+    """
+    codes, lengths = encode_chars(strings)
+    pair_keys = np.minimum(left, right) * len(strings) + np.maximum(left, right)
+    unique_keys, inverse = np.unique(pair_keys, return_inverse=True)
+    u_left = unique_keys // len(strings)
+    u_right = unique_keys % len(strings)
+
+    distance = levenshtein_pairs(codes, lengths, u_left, u_right)[inverse]
+    max_len = np.maximum(lengths[left], lengths[right])
+    both = (lengths[left] > 0) & (lengths[right] > 0)
+
+    similarity = np.zeros(len(left), dtype=np.float64)
+    similarity[both] = 1 - distance[both] / max_len[both]
+    return similarity
+
+
+### -------------------------------
+# 3. Feature Columns
+### -------------------------------
+def pair_indices(n):
+    """
+    All i<j index pairs in the same order as generate_pairs.
+    """
+    return np.triu_indices(n, k=1)
+
+
+def iter_pair_blocks(n, max_pairs=65536):
+    """
+    Yields (left, right) index arrays covering all i<j pairs in
+    generate_pairs order, a few rows of i at a time, so no block holds
+    more than about max_pairs pairs.
+    """
+    i = 0
+    while i < n - 1:
+        stop = i
+        block = 0
+        while stop < n - 1 and (block == 0 or block + (n - 1 - stop) <= max_pairs):
+            block += n - 1 - stop
+            stop += 1
+        left = np.concatenate([np.full(n - 1 - k, k, dtype=np.int64) for k in range(i, stop)])
+        right = np.concatenate([np.arange(k + 1, n, dtype=np.int64) for k in range(i, stop)])
+        yield left, right
+        i = stop
+
+
+def compute_feature_columns(last_words, left=None, right=None, words=None, metrics=None):
+    """
+    Computes the compute_features columns for the word pairs
+    (left[p], right[p]); all i<j pairs when no indices are given.
+    Pass `words` from encode_words to reuse one encoding across blocks.
+    With a Metrics object, Levenshtein time is recorded as its own stage.
+    Returns a dict of NumPy arrays keyed by feature name.
+    """
+    if left is None:
+        left, right = pair_indices(len(last_words))
+    left = np.asarray(left, dtype=np.int64)
+    right = np.asarray(right, dtype=np.int64)
+
+    if not len(left):
+        return {
+            'exact_match': np.zeros(0, dtype=np.int64),
+            'ending_length_min': np.zeros(0, dtype=np.int64),
+            'phoneme_similarity': np.zeros(0, dtype=np.float64),
+            'stress_match': np.zeros(0, dtype=np.int64),
+            'stress_similarity': np.zeros(0, dtype=np.float64),
+            'syllable_diff': np.zeros(0, dtype=np.int64),
+            'label': np.zeros(0, dtype=np.int64),
+        }
+
+    if words is None:
+        words = encode_words(last_words)
+    stress_id = words['stress_id']
+    stress_present = np.array([bool(s) for s in words['stress_strings']])[stress_id]
+
+    with metrics.stage('levenshtein') if metrics is not None else nullcontext():
+        phoneme_similarity = similarity_pairs(
+            words['phoneme_strings'], words['phoneme_id'][left], words['phoneme_id'][right])
+        stress_similarity = similarity_pairs(words['stress_strings'], stress_id[left], stress_id[right])
+
+    return {
+        'exact_match': (words['ending_id'][left] == words['ending_id'][right]).astype(np.int64),
+        'ending_length_min': np.minimum(words['ending_length'][left], words['ending_length'][right]),
+        'phoneme_similarity': phoneme_similarity,
+        'stress_match': ((stress_id[left] == stress_id[right]) & stress_present[left]).astype(np.int64),
+        'stress_similarity': stress_similarity,
+        'syllable_diff': np.abs(words['syllables'][left] - words['syllables'][right]),
+        'label': (words['rhyme_id'][left] == words['rhyme_id'][right]).astype(np.int64),
+    }
+
+
+def columns_to_rows(columns):
+    """
+    Converts feature columns back into the row dicts compute_features returns.
+    """
+    names = list(columns)
+    values = [columns[name].tolist() for name in names]
+    return [dict(zip(names, row)) for row in zip(*values)]
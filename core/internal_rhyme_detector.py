@@ -0,0 +1,179 @@
+import argparse
+import json
+
+from baseline_rhyme_detector import generate_rhyme_group
+from jsonl_stream import StreamWriter
+from parallel import map_chunks
+from vocabulary import Vocabulary, line_words
+
+
+### -------------------------------
+# 1. Trailing-Phoneme Key
+### -------------------------------
+def rhyme_suffix(rhyme_ending, min_match_phonemes=2):
+    """
+    Last min_match_phonemes phonemes of a rhyme ending, or None when the
+    ending is too short to rhyme under the baseline rule. Like
+    RhymeSuffixIndex.suffix, min_match_phonemes <= 0 gives the empty key,
+    which every ending shares.
+    """
+    if min_match_phonemes <= 0:
+        return ()
+    phonemes = rhyme_ending.split()
+    if len(phonemes) < min_match_phonemes:
+        return None
+    return tuple(phonemes[-min_match_phonemes:])
+
+
+### -------------------------------
+# 2. Group Words Through the Index
+### -------------------------------
+def find_internal_groups(lines_words, min_match_phonemes=2, window=1):
+    """
+    Groups words whose endings share their trailing phonemes, within a line
+    and across up to `window` following lines.
+
+    The index maps each trailing-phoneme key to the line it was last seen on
+    and the group it belongs to, so every word costs one dict lookup instead
+    of a comparison with every other word in the verse. A group closes once
+    its key has not been seen for more than `window` lines.
+
+    Returns groups as lists of (line_idx, word_idx) positions.
+    """
+    index = {}  # key: trailing phoneme tuple, value: (last line seen, group index)
+    groups = []
+
+    for line_idx, words in enumerate(lines_words):
+        for word_idx, word in enumerate(words):
+            key = rhyme_suffix(word["rhyme_ending"], min_match_phonemes)
+            if key is None:
+                continue
+
+            seen = index.get(key)
+            if seen is not None and line_idx - seen[0] <= window:
+                group_idx = seen[1]
+            else:
+                group_idx = len(groups)
+                groups.append([])
+
+            groups[group_idx].append((line_idx, word_idx))
+            index[key] = (line_idx, group_idx)
+
+    return groups
+
+
+def is_rhyme_group(group, lines_words):
+    """
+    A group only counts when it has at least two different words; repeating
+    the same word ("i got i got") is not a rhyme.
+    """
+    texts = {lines_words[line_idx][word_idx]["text"] for line_idx, word_idx in group}
+    return len(texts) > 1
+
+
+### -------------------------------
+# 3. Annotate a Song
+### -------------------------------
+def detect_internal_rhymes(song, min_match_phonemes=2, window=1, vocab=None):
+    """
+    Adds "internal_rhymes" spans to every line:
+        {"start": word index, "end": word index + 1, "text": ..., "rhyme_id": ...}
+
+    Labels share the rhyme_id namespace of detect_rhyme_groups: a group that
+    contains a line's last word takes that line's rhyme_id, other groups get
+    the next label not already used by the song.
+    """
+    lines = song["lines"]
+    lines_words = [line_words(line, vocab) for line in lines]
+    groups = [g for g in find_internal_groups(lines_words, min_match_phonemes, window)
+              if is_rhyme_group(g, lines_words)]
+
+    used = {line["rhyme_id"] for line in lines if "rhyme_id" in line}
+    rhyme_group_gen = generate_rhyme_group()
+
+    for line in lines:
+        line["internal_rhymes"] = []
+
+    for group in groups:
+        group_id = None
+        for line_idx, word_idx in group:
+            if word_idx == len(lines_words[line_idx]) - 1 and "rhyme_id" in lines[line_idx]:
+                group_id = lines[line_idx]["rhyme_id"]
+                break
+
+        if group_id is None:
+            group_id = next(rhyme_group_gen)
+            while group_id in used:
+                group_id = next(rhyme_group_gen)
+            used.add(group_id)
+
+        for line_idx, word_idx in group:
+            lines[line_idx]["internal_rhymes"].append({
+                "start": word_idx,
+                "end": word_idx + 1,
+                "text": lines_words[line_idx][word_idx]["text"],
+                "rhyme_id": group_id,
+            })
+
+    for line in lines:
+        line["internal_rhymes"].sort(key=lambda span: span["start"])
+
+    return song
+
+
+### -------------------------------
+# 4. Chunk Worker
+### -------------------------------
+WORKER_CONFIG = {"min_match_phonemes": 2, "window": 1, "vocab_path": None, "vocab": None}
+
+
+def init_worker(config):
+    WORKER_CONFIG.update(config)
+    if WORKER_CONFIG["vocab_path"]:
+        WORKER_CONFIG["vocab"] = Vocabulary.load(WORKER_CONFIG["vocab_path"])
+
+
+def annotate_chunk(raw_lines):
+    out = []
+    for raw in raw_lines:
+        song = json.loads(raw)
+        detect_internal_rhymes(song, WORKER_CONFIG["min_match_phonemes"], WORKER_CONFIG["window"],
+                               WORKER_CONFIG["vocab"])
+        out.append(json.dumps(song) + "\n")
+    return "".join(out)
+
+
+### -------------------------------
+# 5. Main Pipeline
+### -------------------------------
+def main():
+    parser = argparse.ArgumentParser(description="Annotate internal rhymes within and across adjacent lines")
+    parser.add_argument("--input", default="rhyme_annotated.jsonl")
+    parser.add_argument("--output", default="internal_rhymes.jsonl")
+    parser.add_argument("--min-match", type=int, default=2)
+    parser.add_argument("--window", type=int, default=1,
+                        help="How many following lines a rhyme can reach across")
+    parser.add_argument("--vocab", default=None,
+                        help="Vocabulary file for songs stored as word_ids")
+    parser.add_argument("--checkpoint", default=None)
+    parser.add_argument("--flush-every", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--chunk-size", type=int, default=64)
+    args = parser.parse_args()
+
+    if args.min_match < 1:
+        parser.error("--min-match must be at least 1")
+
+    config = {"min_match_phonemes": args.min_match, "window": args.window, "vocab_path": args.vocab}
+
+    with StreamWriter(args.output, args.checkpoint, args.flush_every) as writer:
+        chunks = map_chunks(annotate_chunk, args.input, writer.resume_offset, args.workers,
+                            args.chunk_size, init_worker, (config,))
+        for text, offset, count in chunks:
+            writer.write(text, offset, count)
+
+    print(f"Saved internal rhymes to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
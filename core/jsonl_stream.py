@@ -0,0 +1,137 @@
+import json
+import os
+from collections import Counter
+
+
+### -------------------------------
+# 1. Streaming JSONL Reader
+### -------------------------------
+def iter_jsonl_offsets(filepath, start_offset=0, skip=None):
+    """
+    Yields (record, end_offset) one line at a time, where end_offset is the
+    byte position just after the record. Only one song is held in memory.
+    Lines starting at a byte offset in `skip` are passed over unparsed.
+    """
+    with open(filepath, "rb") as f:
+        f.seek(start_offset)
+        offset = start_offset
+        for raw in f:
+            start = offset
+            offset += len(raw)
+            if raw.strip() and not (skip and start in skip):
+                yield json.loads(raw), offset
+
+
+def iter_jsonl(filepath, start_offset=0):
+    for record, _ in iter_jsonl_offsets(filepath, start_offset):
+        yield record
+
+
+### -------------------------------
+# 2. Checkpoint
+### -------------------------------
+def load_checkpoint(checkpoint_path):
+    """
+    Returns {"input_offset": int, "output_offset": int, "records": int,
+    "totals": [...]}, zeros if there is nothing to resume from.
+    """
+    if checkpoint_path and os.path.exists(checkpoint_path):
+        with open(checkpoint_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return {"input_offset": 0, "output_offset": 0}
+
+
+def save_checkpoint(checkpoint_path, input_offset, output_offset, totals=None, records=0):
+    tmp_path = checkpoint_path + ".tmp"
+    checkpoint = {"input_offset": input_offset, "output_offset": output_offset, "records": records}
+    if totals:
+        # [key, count] pairs, so non-string keys survive the round trip
+        checkpoint["totals"] = [[key, count] for key, count in totals.items()]
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, checkpoint_path)
+
+
+### -------------------------------
+# 3. Buffered, Resumable Writer
+### -------------------------------
+class StreamWriter:
+    """
+    Buffers output text and flushes it every `flush_every` songs.
+
+    With a checkpoint path, each flush also records how far the input and
+    output have got, so an interrupted run can pick up from `resume_offset`
+    instead of starting over. The output is truncated back to the last
+    checkpoint, which drops anything written after it.
+
+    Callers can keep running counts in `totals`. They are saved with each
+    checkpoint and restored on resume, so they cover the whole output and
+    not just this run; update them before writing the records they count.
+    `records` is the number of input records written so far, resumed runs
+    included.
+    """
+
+    def __init__(self, output_path, checkpoint_path=None, flush_every=100):
+        self.output_path = output_path
+        self.checkpoint_path = checkpoint_path
+        self.flush_every = flush_every
+        self.buffer = []
+        self.pending = 0
+        self.input_offset = 0
+        self.records = 0
+        self.totals = Counter()
+
+        checkpoint = load_checkpoint(checkpoint_path)
+        self.resume_offset = checkpoint["input_offset"]
+        output_offset = checkpoint["output_offset"]
+
+        if output_offset and os.path.exists(output_path):
+            self.file = open(output_path, "r+b")
+            self.file.truncate(output_offset)
+            self.file.seek(output_offset)
+            self.totals.update({key: count for key, count in checkpoint.get("totals", [])})
+            self.records = checkpoint.get("records", 0)
+        else:
+            self.resume_offset = 0
+            self.file = open(output_path, "wb")
+
+    @property
+    def resumed(self):
+        return self.resume_offset > 0
+
+    def write(self, text, input_offset=None, records=1):
+        if text:
+            self.buffer.append(text)
+        if input_offset is not None:
+            self.input_offset = input_offset
+        self.pending += records
+        self.records += records
+        if self.pending >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            self.file.write("".join(self.buffer).encode("utf-8"))
+            self.buffer = []
+        self.file.flush()
+        self.pending = 0
+        if self.checkpoint_path:
+            save_checkpoint(self.checkpoint_path, self.input_offset, self.file.tell(), self.totals, self.records)
+
+    def close(self):
+        self.flush()
+        self.file.close()
+        # A finished run has nothing to resume
+        if self.checkpoint_path and os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            # Keep the last checkpoint so the run can be resumed
+            self.file.close()
+        return False
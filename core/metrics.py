@@ -0,0 +1,135 @@
+import cProfile
+import json
+import os
+import resource
+import time
+import tracemalloc
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+
+### -------------------------------
+# 1. Stage Timers and Counters
+### -------------------------------
+class Metrics:
+    """
+    Per-stage wall-clock timers plus named counters.
+
+    Pool workers keep their own Metrics and hand back drain() snapshots,
+    which the parent merge()s; worker stage times are therefore summed
+    across processes (CPU-seconds), not wall time.
+    """
+
+    def __init__(self):
+        self.seconds = defaultdict(float)
+        self.calls = Counter()
+        self.counters = Counter()
+        self.gauges = {}
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[name] += time.perf_counter() - start
+            self.calls[name] += 1
+
+    def count(self, name, n=1):
+        self.counters[name] += n
+
+    def gauge(self, name, value):
+        self.gauges[name] = value
+
+    def snapshot(self):
+        return {
+            "timers": {name: {"seconds": round(self.seconds[name], 6), "calls": self.calls[name]}
+                       for name in self.seconds},
+            "counters": dict(self.counters),
+            "gauges": dict(self.gauges),
+        }
+
+    def drain(self):
+        snapshot = self.snapshot()
+        self.__init__()
+        return snapshot
+
+    def merge(self, snapshot):
+        if not snapshot:
+            return
+        for name, timer in snapshot["timers"].items():
+            self.seconds[name] += timer["seconds"]
+            self.calls[name] += timer["calls"]
+        self.counters.update(snapshot["counters"])
+        self.gauges.update(snapshot["gauges"])
+
+
+### -------------------------------
+# 2. Structured Dump
+### -------------------------------
+def dump_metrics(metrics, path, pipeline):
+    """
+    Appends one JSON line per run, or writes a Prometheus text file when the
+    path ends in .prom.
+    """
+    metrics.gauge("rss_high_water_mb", round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1))
+    snapshot = metrics.snapshot()
+
+    if path.endswith(".prom"):
+        lines = []
+        for name, timer in snapshot["timers"].items():
+            lines.append(f'music_guru_stage_seconds{{pipeline="{pipeline}",stage="{name}"}} {timer["seconds"]}')
+            lines.append(f'music_guru_stage_calls{{pipeline="{pipeline}",stage="{name}"}} {timer["calls"]}')
+        for name, value in snapshot["counters"].items():
+            lines.append(f'music_guru_count{{pipeline="{pipeline}",name="{name}"}} {value}')
+        for name, value in snapshot["gauges"].items():
+            lines.append(f'music_guru_gauge{{pipeline="{pipeline}",name="{name}"}} {value}')
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, path)
+    else:
+        record = {
+            "pipeline": pipeline,
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            **snapshot,
+        }
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+
+    print(f"Saved metrics to {path}")
+
+
+### -------------------------------
+# 3. Optional Profiling
+### -------------------------------
+@contextmanager
+def profiled(metrics, profile_path=None, trace_memory=False):
+    """
+    Wraps a run in cProfile (stats written to profile_path) and/or
+    tracemalloc (peak recorded as the traced_peak_mb gauge). Both only see
+    the current process, so profile with --workers 1 for the full picture.
+    """
+    profiler = cProfile.Profile() if profile_path else None
+    if trace_memory:
+        tracemalloc.start()
+    if profiler:
+        profiler.enable()
+    try:
+        yield
+    finally:
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(profile_path)
+            print(f"Saved profile to {profile_path}")
+        if trace_memory:
+            metrics.gauge("traced_peak_mb", round(tracemalloc.get_traced_memory()[1] / 2**20, 1))
+            tracemalloc.stop()
+
+
+def add_metrics_arguments(parser):
+    parser.add_argument("--metrics-out", default=None,
+                        help="Append stage timings as JSON lines, or write Prometheus text if it ends in .prom")
+    parser.add_argument("--profile", default=None, help="Write cProfile stats for this process to this path")
+    parser.add_argument("--trace-memory", action="store_true", help="Record the tracemalloc peak")
@@ -0,0 +1,254 @@
+import argparse
+import json
+
+import numpy as np
+
+from jsonl_stream import StreamWriter
+from parallel import map_chunks
+from vocabulary import Vocabulary, line_words
+
+
+### -------------------------------
+# 1. Vowel Stream
+### -------------------------------
+def vowel_stream(lines_words, stressed_only=False):
+    """
+    Flattens a song into its vowel sounds (stress digits removed), keeping
+    (line_idx, word_idx) for each vowel. Vowels run across word boundaries;
+    each line ends with a unique separator so no pattern spans two lines.
+
+    Returns (symbols, positions, vowel_names) with symbols as ints and
+    positions[k] = None for separators.
+    """
+    vowel_ids = {}
+    symbols = []
+    positions = []
+
+    for line_idx, words in enumerate(lines_words):
+        for word_idx, word in enumerate(words):
+            for phoneme in word["phonemes"]:
+                if not phoneme[-1].isdigit():
+                    continue
+                if stressed_only and phoneme[-1] == "0":
+                    continue
+                vowel = phoneme[:-1]
+                symbols.append(vowel_ids.setdefault(vowel, len(vowel_ids)))
+                positions.append((line_idx, word_idx))
+        symbols.append(None)
+        positions.append(None)
+
+    # Separators get ids after every vowel and are all distinct
+    next_id = len(vowel_ids)
+    for k, symbol in enumerate(symbols):
+        if symbol is None:
+            symbols[k] = next_id
+            next_id += 1
+
+    return symbols, positions, list(vowel_ids)
+
+
+### -------------------------------
+# 2. Suffix Array + LCP
+### -------------------------------
+def suffix_array(symbols):
+    """
+    Prefix-doubling suffix array: O(n log n) rounds of NumPy sorting.
+    """
+    n = len(symbols)
+    if n == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    rank = np.asarray(symbols, dtype=np.int64)
+    k = 1
+    while True:
+        second = np.full(n, -1, dtype=np.int64)
+        second[:n - k] = rank[k:]
+        sa = np.lexsort((second, rank))
+
+        changed = (rank[sa][1:] != rank[sa][:-1]) | (second[sa][1:] != second[sa][:-1])
+        new_rank = np.empty(n, dtype=np.int64)
+        new_rank[sa] = np.concatenate(([0], np.cumsum(changed)))
+        rank = new_rank
+
+        if rank.max() == n - 1 or k >= n:
+            return sa
+        k *= 2
+
+
+def lcp_array(symbols, sa):
+    """
+    Kasai's algorithm. lcp[i] is the common prefix length of suffixes
+    sa[i - 1] and sa[i]; lcp[0] is 0.
+    """
+    n = len(symbols)
+    rank = np.empty(n, dtype=np.int64)
+    rank[sa] = np.arange(n)
+    lcp = [0] * n
+    h = 0
+    for i in range(n):
+        r = rank[i]
+        if r > 0:
+            j = sa[r - 1]
+            while i + h < n and j + h < n and symbols[i + h] == symbols[j + h]:
+                h += 1
+            lcp[r] = h
+            if h:
+                h -= 1
+        else:
+            h = 0
+    return lcp
+
+
+### -------------------------------
+# 3. Repeated Vowel Patterns
+### -------------------------------
+def repeated_patterns(symbols, min_syllables=3, max_syllables=6):
+    """
+    Finds vowel sequences of min_syllables..max_syllables that occur more
+    than once. Each LCP interval (a block of adjacent suffixes sharing a
+    prefix longer than the blocks around it) is one pattern, at its own
+    length and with its own occurrences; nested intervals are walked with a
+    stack in one pass over the LCP array. LCP values are capped at
+    max_syllables, so longer repeats are reported at that length.
+
+    Returns [(length, [start positions])]. Patterns that are just the tail
+    of a longer pattern (every occurrence preceded by the same vowel) are
+    left out.
+    """
+    sa = suffix_array(symbols)
+    lcp = [min(h, max_syllables) for h in lcp_array(symbols, sa)]
+    n = len(symbols)
+    patterns = []
+
+    # (shared length, first suffix) of the intervals still open
+    stack = [(0, 0)]
+    for i in range(1, n + 1):
+        shared = lcp[i] if i < n else 0
+        lb = i - 1
+        while shared < stack[-1][0]:
+            length, lb = stack.pop()
+            if length < min_syllables:
+                continue
+            starts = sorted(int(p) for p in sa[lb:i])
+            before = {symbols[p - 1] if p > 0 else None for p in starts}
+            if len(before) == 1 and None not in before:
+                continue
+            patterns.append((length, starts))
+        if shared > stack[-1][0]:
+            stack.append((shared, lb))
+
+    return patterns
+
+
+def non_overlapping(starts, length):
+    kept = []
+    for p in starts:
+        if not kept or p >= kept[-1] + length:
+            kept.append(p)
+    return kept
+
+
+### -------------------------------
+# 4. Annotate a Song
+### -------------------------------
+def detect_multisyllabic_rhymes(song, min_syllables=3, max_syllables=6, stressed_only=False, vocab=None):
+    """
+    Adds "multisyllabic_rhymes" to the song: each entry is a repeated vowel
+    pattern with every place it occurs,
+        {"vowels": [...], "syllables": n,
+         "occurrences": [{"line_id", "start", "end", "text"}]}
+    where start/end are word indices in the line (end exclusive).
+    Repeats of the exact same words (a chorus sung twice) are not reported.
+    """
+    lines = song["lines"]
+    lines_words = [line_words(line, vocab) for line in lines]
+    symbols, positions, vowel_names = vowel_stream(lines_words, stressed_only)
+
+    rhymes = []
+    for length, starts in repeated_patterns(symbols, min_syllables, max_syllables):
+        occurrences = []
+        for p in non_overlapping(starts, length):
+            line_idx, first_word = positions[p]
+            last_word = positions[p + length - 1][1]
+            words = lines_words[line_idx][first_word:last_word + 1]
+            occurrences.append({
+                "line_id": lines[line_idx].get("line_id", line_idx),
+                "start": first_word,
+                "end": last_word + 1,
+                "text": " ".join(w["text"] for w in words),
+            })
+
+        if len({o["text"] for o in occurrences}) < 2:
+            continue
+
+        rhymes.append({
+            "vowels": [vowel_names[s] for s in symbols[starts[0]:starts[0] + length]],
+            "syllables": length,
+            "occurrences": occurrences,
+        })
+
+    rhymes.sort(key=lambda r: (r["occurrences"][0]["line_id"], r["occurrences"][0]["start"]))
+    song["multisyllabic_rhymes"] = rhymes
+    return song
+
+
+### -------------------------------
+# 5. Chunk Worker
+### -------------------------------
+WORKER_CONFIG = {"min_syllables": 3, "max_syllables": 6, "stressed_only": False,
+                 "vocab_path": None, "vocab": None}
+
+
+def init_worker(config):
+    WORKER_CONFIG.update(config)
+    if WORKER_CONFIG["vocab_path"]:
+        WORKER_CONFIG["vocab"] = Vocabulary.load(WORKER_CONFIG["vocab_path"])
+
+
+def annotate_chunk(raw_lines):
+    out = []
+    for raw in raw_lines:
+        song = json.loads(raw)
+        detect_multisyllabic_rhymes(song, WORKER_CONFIG["min_syllables"], WORKER_CONFIG["max_syllables"],
+                                    WORKER_CONFIG["stressed_only"], WORKER_CONFIG["vocab"])
+        out.append(json.dumps(song) + "\n")
+    return "".join(out)
+
+
+### -------------------------------
+# 6. Main Pipeline
+### -------------------------------
+def main():
+    parser = argparse.ArgumentParser(description="Annotate multisyllabic rhymes from repeated vowel patterns")
+    parser.add_argument("--input", default="rhyme_annotated.jsonl")
+    parser.add_argument("--output", default="multisyllabic_rhymes.jsonl")
+    parser.add_argument("--min-syllables", type=int, default=3)
+    parser.add_argument("--max-syllables", type=int, default=6)
+    parser.add_argument("--stressed-only", action="store_true",
+                        help="Only use vowels with primary or secondary stress")
+    parser.add_argument("--vocab", default=None,
+                        help="Vocabulary file for songs stored as word_ids")
+    parser.add_argument("--checkpoint", default=None)
+    parser.add_argument("--flush-every", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--chunk-size", type=int, default=64)
+    args = parser.parse_args()
+
+    config = {
+        "min_syllables": args.min_syllables,
+        "max_syllables": args.max_syllables,
+        "stressed_only": args.stressed_only,
+        "vocab_path": args.vocab,
+    }
+
+    with StreamWriter(args.output, args.checkpoint, args.flush_every) as writer:
+        chunks = map_chunks(annotate_chunk, args.input, writer.resume_offset, args.workers,
+                            args.chunk_size, init_worker, (config,))
+        for text, offset, count in chunks:
+            writer.write(text, offset, count)
+
+    print(f"Saved multisyllabic rhymes to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
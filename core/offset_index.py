@@ -0,0 +1,291 @@
+import argparse
+import hashlib
+import json
+import mmap
+import os
+
+import numpy as np
+
+from dedup import file_fingerprint
+
+
+RECORD_DTYPE = np.dtype([("key", "<u8"), ("hash", "<u8"), ("offset", "<i8"), ("length", "<i8")])
+META_FILE = "meta.json"
+
+
+### -------------------------------
+# 1. Keys
+### -------------------------------
+def hash64(data):
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "little")
+
+
+def song_key(artist, title):
+    """
+    Case- and whitespace-insensitive artist/title key. Cleaned lyrics store
+    the title as "song", later stages as "title"; both give the same key.
+    """
+    return hash64(f"{artist.strip().lower()}\t{title.strip().lower()}".encode("utf-8"))
+
+
+def content_hash(raw):
+    """
+    Hash of one raw JSONL line without its line ending. On the command
+    line it is given as hash:<16 hex digits>.
+    """
+    return hash64(raw.rstrip(b"\r\n"))
+
+
+def index_path(source):
+    return source + ".idx"
+
+
+### -------------------------------
+# 2. Build and Append
+### -------------------------------
+def scan_records(f, start_offset):
+    """
+    One streaming pass from start_offset to the end of the file.
+    Returns a RECORD_DTYPE array in file order, the offset scanned to, and
+    the offset of a final line without a line ending (None if there is
+    none). Such a line is indexed when it parses as complete JSON, and is
+    scanned again on the next update in case it was still being written.
+    """
+    records = []
+    f.seek(start_offset)
+    offset = start_offset
+    open_line = None
+    for raw in f:
+        start = offset
+        offset += len(raw)
+        if not raw.strip():
+            continue
+        if not raw.endswith(b"\n"):
+            try:
+                song = json.loads(raw)
+            except ValueError:
+                # Cut off mid-record; index it on the next update
+                offset = start
+                break
+            open_line = start
+        else:
+            song = json.loads(raw)
+        key = song_key(song.get("artist", ""), song.get("title", song.get("song", "")))
+        records.append((key, content_hash(raw), start, len(raw.rstrip(b"\r\n"))))
+    return np.array(records, dtype=RECORD_DTYPE), offset, open_line
+
+
+def update_index(source, directory=None, rebuild=False):
+    """
+    Brings the sidecar index of `source` up to date and returns its
+    directory:
+
+        rhyme_annotated.jsonl.idx/
+            meta.json       bytes indexed so far, a fingerprint of them and
+                            where an unterminated final line starts
+            records.npy     (key, hash, offset, length), sorted by key
+            by_hash.npy     record positions sorted by content hash
+            hashes.npy      the content hashes in that order
+
+    Songs appended since the last update are scanned and merged in; the
+    index is rebuilt from scratch when the indexed part of the file has
+    changed (truncated or rewritten).
+    """
+    directory = directory or index_path(source)
+    meta_path = os.path.join(directory, META_FILE)
+    meta = None
+    if not rebuild and os.path.exists(meta_path):
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+
+    with open(source, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if meta is not None:
+            indexed = meta["indexed_bytes"]
+            if size < indexed or file_fingerprint(f, indexed) != meta["fingerprint"]:
+                meta = None
+            elif size == indexed:
+                return directory
+
+        start = 0
+        if meta:
+            start = meta["indexed_bytes"] if meta.get("open_line") is None else meta["open_line"]
+        new_records, end, open_line = scan_records(f, start)
+        fingerprint = file_fingerprint(f, end)
+
+    if meta is not None:
+        old = np.load(os.path.join(directory, "records.npy"))
+        old = old[np.argsort(old["offset"], kind="stable")]
+        records = np.concatenate([old[old["offset"] < start], new_records])
+    else:
+        records = new_records
+
+    os.makedirs(directory, exist_ok=True)
+    records = records[np.argsort(records["key"], kind="stable")]
+    np.save(os.path.join(directory, "records.npy"), records)
+    by_hash = np.argsort(records["hash"], kind="stable")
+    np.save(os.path.join(directory, "by_hash.npy"), by_hash)
+    np.save(os.path.join(directory, "hashes.npy"), records["hash"][by_hash])
+
+    tmp_path = meta_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"indexed_bytes": end, "fingerprint": fingerprint, "open_line": open_line,
+                   "songs": len(records)}, f)
+    os.replace(tmp_path, meta_path)
+    return directory
+
+
+### -------------------------------
+# 3. Memory-Mapped Reader
+### -------------------------------
+class OffsetIndex:
+    """
+    Random access into a JSONL file through its sidecar index. The index
+    arrays and the JSONL file are memory-mapped, so a lookup is a binary
+    search plus one slice of the file, whatever the file size.
+    """
+
+    def __init__(self, source, directory=None, update=True):
+        self.source = source
+        directory = directory or index_path(source)
+        if update:
+            update_index(source, directory)
+        self.records = np.load(os.path.join(directory, "records.npy"), mmap_mode="r")
+        self.by_hash = np.load(os.path.join(directory, "by_hash.npy"), mmap_mode="r")
+        self.hashes = np.load(os.path.join(directory, "hashes.npy"), mmap_mode="r")
+        self.file = open(source, "rb")
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if os.path.getsize(source) else b""
+
+    def __len__(self):
+        return len(self.records)
+
+    def find(self, artist, title):
+        """
+        (offset, length) of every song with this artist and title, in file
+        order.
+        """
+        key = np.uint64(song_key(artist, title))
+        start = np.searchsorted(self.records["key"], key, side="left")
+        stop = np.searchsorted(self.records["key"], key, side="right")
+        return [(int(r["offset"]), int(r["length"])) for r in self.records[start:stop]]
+
+    def find_hash(self, digest):
+        """
+        (offset, length) of the song whose raw line hashes to digest (hex).
+        """
+        value = np.uint64(int(digest, 16))
+        pos = np.searchsorted(self.hashes, value)
+        if pos < len(self.hashes) and self.hashes[pos] == value:
+            record = self.records[self.by_hash[pos]]
+            return int(record["offset"]), int(record["length"])
+        return None
+
+    def read_raw(self, offset, length):
+        return self.data[offset:offset + length]
+
+    def read(self, offset, length):
+        return json.loads(self.read_raw(offset, length))
+
+    def spans(self, songs):
+        """
+        (offset, length) for a list of (artist, title) pairs or "hash:<hex>"
+        strings, in the order given. Unknown songs are reported and skipped,
+        and a song selected twice is only returned once.
+        """
+        found = []
+        seen = set()
+        for song in songs:
+            if isinstance(song, str) and song.startswith("hash:"):
+                span = self.find_hash(song[len("hash:"):])
+                hits = [span] if span else []
+            else:
+                hits = self.find(*song)
+            if not hits:
+                print(f"Not in {self.source}: {song}")
+            found.extend(span for span in hits if span not in seen)
+            seen.update(hits)
+        return found
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+### -------------------------------
+# 4. Song Selection
+### -------------------------------
+def parse_song(spec):
+    """
+    "artist|title" -> (artist, title); "hash:<hex>" is passed through.
+    """
+    if spec.startswith("hash:"):
+        return spec
+    artist, sep, title = spec.partition("|")
+    if not sep:
+        raise ValueError(f"expected 'artist|title' or 'hash:<hex>', got {spec!r}")
+    return artist, title
+
+
+def add_selection_arguments(parser):
+    parser.add_argument("--song", action="append", default=[],
+                        help="Only process this song, as 'artist|title' or 'hash:<hex>' (repeatable)")
+    parser.add_argument("--select", default=None, help="File with one --song value per line")
+
+
+def selected_spans(parser, args):
+    """
+    Offsets of the songs picked with --song/--select, or None to process
+    the whole input. A malformed song value is a usage error.
+    """
+    specs = list(args.song)
+    if args.select:
+        with open(args.select, "r", encoding="utf-8") as f:
+            specs.extend(line.strip() for line in f if line.strip())
+    if not specs:
+        return None
+    try:
+        songs = [parse_song(spec) for spec in specs]
+    except ValueError as e:
+        parser.error(str(e))
+    with OffsetIndex(args.input) as index:
+        return index.spans(songs)
+
+
+### -------------------------------
+# 5. Main
+### -------------------------------
+def main():
+    parser = argparse.ArgumentParser(description="Build or query the byte-offset index of a JSONL file")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build = sub.add_parser("build", help="Create the index, or add songs appended since the last run")
+    build.add_argument("--input", default="rhyme_annotated.jsonl")
+    build.add_argument("--rebuild", action="store_true", help="Index the whole file again")
+
+    get = sub.add_parser("get", help="Print songs by artist/title or content hash")
+    get.add_argument("--input", default="rhyme_annotated.jsonl")
+    add_selection_arguments(get)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        directory = update_index(args.input, rebuild=args.rebuild)
+        with open(os.path.join(directory, META_FILE), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        print(f"Indexed {meta['songs']} songs ({meta['indexed_bytes']} bytes) in {directory}")
+        return
+
+    spans = selected_spans(get, args) or []
+    with OffsetIndex(args.input, update=False) as index:
+        for offset, length in spans:
+            print(index.read_raw(offset, length).decode("utf-8"))
+
+
+if __name__ == "__main__":
+    main()
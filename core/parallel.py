@@ -0,0 +1,133 @@
+import mmap
+import multiprocessing
+from collections import deque
+
+
+### -------------------------------
+# 1. Chunked Raw Reader
+### -------------------------------
+def iter_raw_chunks(filepath, start_offset=0, chunk_size=64, skip=None):
+    """
+    Yields (raw_lines, end_offset) with up to chunk_size undecoded JSONL
+    lines per chunk. Parsing is left to the workers. Lines starting at a
+    byte offset in `skip` are left out.
+    """
+    with open(filepath, "rb") as f:
+        f.seek(start_offset)
+        offset = start_offset
+        chunk = []
+        for raw in f:
+            start = offset
+            offset += len(raw)
+            if raw.strip() and not (skip and start in skip):
+                chunk.append(raw)
+            if len(chunk) >= chunk_size:
+                yield chunk, offset
+                chunk = []
+        if chunk:
+            yield chunk, offset
+
+
+def iter_span_chunks(filepath, spans, chunk_size=64):
+    """
+    Like iter_raw_chunks, but only for the (offset, length) spans given,
+    e.g. from an OffsetIndex. The file is memory-mapped and each song is one
+    slice. There is no meaningful resume offset, so None is yielded.
+    """
+    if not spans:
+        return
+    with open(filepath, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        for start in range(0, len(spans), chunk_size):
+            yield [data[offset:offset + length] for offset, length in spans[start:start + chunk_size]], None
+
+
+def read_chunks(filepath, start_offset=0, chunk_size=64, skip=None, spans=None):
+    if spans is not None:
+        return iter_span_chunks(filepath, spans, chunk_size)
+    return iter_raw_chunks(filepath, start_offset, chunk_size, skip)
+
+
+### -------------------------------
+# 2. Ordered Process Pool Map
+### -------------------------------
+def map_ordered(worker, tasks, workers=1, initializer=None, initargs=()):
+    """
+    Runs worker(payload) for every (payload, meta) in tasks and yields
+    (result, meta) in input order.
+
+    With workers <= 1 everything runs in this process, so the serial and
+    parallel paths share the same worker code and produce the same output.
+    At most 2 * workers tasks are in flight, keeping memory bounded.
+    """
+    if workers <= 1:
+        if initializer is not None:
+            initializer(*initargs)
+        for payload, meta in tasks:
+            yield worker(payload), meta
+        return
+
+    with multiprocessing.Pool(workers, initializer, initargs) as pool:
+        pending = deque()
+        for payload, meta in tasks:
+            pending.append((pool.apply_async(worker, (payload,)), meta))
+            if len(pending) >= 2 * workers:
+                result, meta = pending.popleft()
+                yield result.get(), meta
+        while pending:
+            result, meta = pending.popleft()
+            yield result.get(), meta
+
+
+def map_chunks(worker, filepath, start_offset=0, workers=1, chunk_size=64,
+               initializer=None, initargs=(), skip=None, spans=None):
+    """
+    Runs worker(raw_lines) over every chunk of the file and yields
+    (result, end_offset, song_count) in input order. With `spans` only
+    those songs are read and end_offset is None.
+    """
+    tasks = ((lines, (offset, len(lines))) for lines, offset in
+             read_chunks(filepath, start_offset, chunk_size, skip, spans))
+    for result, (offset, count) in map_ordered(worker, tasks, workers, initializer, initargs):
+        yield result, offset, count
+
+
+### -------------------------------
+# 3. Per-Song Map With a Result Cache
+### -------------------------------
+def map_songs(worker, filepath, start_offset=0, workers=1, chunk_size=64,
+              initializer=None, initargs=(), cache=None, metrics=None, skip=None, spans=None):
+    """
+    Like map_chunks, but worker(raw_lines) returns (one result per line,
+    worker metrics snapshot) and this yields (results, end_offset, song_count).
+    Worker snapshots are merged into `metrics` when given.
+
+    With an AnnotationCache, songs whose key is already stored are served
+    from it and only the misses are sent to the workers; new results are
+    written back as they arrive.
+    """
+    def tasks():
+        for lines, offset in read_chunks(filepath, start_offset, chunk_size, skip, spans):
+            keys = [cache.key(raw) for raw in lines] if cache else [None] * len(lines)
+            hits = cache.get_many(keys) if cache else {}
+            misses = [raw for raw, key in zip(lines, keys) if key not in hits]
+            yield misses, (keys, hits, offset, len(lines))
+
+    for (computed, snapshot), (keys, hits, offset, count) in map_ordered(
+            worker, tasks(), workers, initializer, initargs):
+        if metrics is not None:
+            metrics.merge(snapshot)
+            metrics.count("songs", count)
+            metrics.count("cache_hits", sum(1 for key in keys if key in hits))
+        computed = iter(computed)
+        results = []
+        fresh = {}
+        for key in keys:
+            if key in hits:
+                results.append(hits[key])
+            else:
+                result = next(computed)
+                results.append(result)
+                fresh[key] = result
+        if cache and fresh:
+            cache.put_many(fresh)
+        yield results, offset, count
@@ -0,0 +1,91 @@
+import argparse
+import json
+import re
+
+from dedup import add_dedup_arguments, dedup_skip
+from jsonl_stream import StreamWriter, iter_jsonl_offsets
+from pronunciation import PronunciationTable, load_cmudict
+from vocabulary import Vocabulary
+
+
+# Keep apostrophes and hyphens inside words ("you's", "trailer-park")
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:['-][a-z0-9]+)*'?")
+
+
+### -------------------------------
+# 1. Tokenize
+### -------------------------------
+def tokenize(text):
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+### -------------------------------
+# 2. Preprocess a Song
+### -------------------------------
+def preprocess_song(song, table, vocab=None):
+    """
+    Turns a cleaned {"artist", "song", "lyrics": [...]} record into the
+    word-level format the rhyme detector reads. With a vocabulary, each line
+    stores "word_ids" instead of full word records.
+    """
+    lines = []
+    for line_id, text in enumerate(song.get("lyrics", [])):
+        records = [table.lookup(token) for token in tokenize(text)]
+        line = {"line_id": line_id, "text": text}
+        if vocab is not None:
+            line["word_ids"] = [vocab.id_for(record) for record in records]
+        else:
+            line["words"] = records
+        lines.append(line)
+
+    return {
+        "artist": song.get("artist", ""),
+        "title": song.get("song", song.get("title", "")),
+        "lines": lines,
+    }
+
+
+### -------------------------------
+# 3. Main Pipeline
+### -------------------------------
+def main():
+    parser = argparse.ArgumentParser(description="Convert cleaned lyrics into word-level pronunciation records")
+    parser.add_argument("--input", default="./assets/lyrics_dataset_fixed.jsonl")
+    parser.add_argument("--output", default="preprocessed.jsonl")
+    parser.add_argument("--table", default="./assets/pronunciation_table.json",
+                        help="Precomputed word -> record table, created or extended as words are seen")
+    parser.add_argument("--cmudict", default=None, help="CMUdict-format pronunciation file")
+    parser.add_argument("--vocab", default=None,
+                        help="Write word IDs per line and their records to this vocabulary file")
+    parser.add_argument("--checkpoint", default=None)
+    parser.add_argument("--flush-every", type=int, default=100)
+    add_dedup_arguments(parser)
+    args = parser.parse_args()
+
+    cmudict = load_cmudict(args.cmudict) if args.cmudict else None
+    table = PronunciationTable(args.table, cmudict)
+    vocab = Vocabulary.load(args.vocab) if args.vocab else None
+    skip = dedup_skip(parser, args)
+
+    song_count = 0
+    with StreamWriter(args.output, args.checkpoint, args.flush_every) as writer:
+        for song, offset in iter_jsonl_offsets(args.input, writer.resume_offset, skip):
+            preprocessed = preprocess_song(song, table, vocab)
+            writer.write(json.dumps(preprocessed) + "\n", offset)
+            song_count += 1
+            # Vocabulary must cover every ID written so far before a checkpoint
+            if vocab is not None and writer.pending == 0:
+                vocab.save(args.vocab)
+
+    table.save()
+    if vocab is not None:
+        vocab.save(args.vocab)
+        print(f"✅ Saved {len(vocab)} vocabulary entries to {args.vocab}")
+
+    info = table.lookup.cache_info()
+    print(f"Lookups: {info.hits + info.misses}, cache hits: {info.hits}")
+    print(f"Saved {song_count} preprocessed songs to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
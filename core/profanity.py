@@ -0,0 +1,274 @@
+import argparse
+import json
+import os
+import time
+from collections import Counter, deque
+
+from jsonl_stream import StreamWriter
+from parallel import map_chunks
+
+
+DEFAULT_TERMS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "assets", "profanity_terms.txt")
+
+# One character to one character, so match positions in the normalised
+# text are positions in the original line
+LEET = str.maketrans("013457@$!", "oieastasi")
+
+
+### -------------------------------
+# 1. Normalisation
+### -------------------------------
+def normalize_text(text, leet=True):
+    """
+    Lowercases (and optionally de-leets) text without changing its length.
+    """
+    if leet:
+        text = text.translate(LEET)
+    lowered = text.lower()
+    if len(lowered) == len(text):
+        return lowered
+    # A few characters lowercase to two ("İ"); keep those as they are
+    return ''.join(c if len(c.lower()) != 1 else c.lower() for c in text)
+
+
+def load_terms(path):
+    """
+    Reads a terms file: one term per line, '#' comments, a trailing '*'
+    for terms that may continue into a longer word, and a leading '-' for
+    words that a prefix term must not flag ("-dickens").
+    Returns ([(term, prefix)], [allowed word]).
+    """
+    terms = []
+    allowed = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.split("#", 1)[0].strip()
+            if not line:
+                continue
+            if line.startswith("-"):
+                allowed.append(line[1:].strip())
+                continue
+            prefix = line.endswith("*")
+            terms.append((line.rstrip("*"), prefix))
+    return terms, allowed
+
+
+### -------------------------------
+# 2. Aho-Corasick Automaton
+### -------------------------------
+class AhoCorasick:
+    """
+    Finds every occurrence of every term in one left-to-right pass over the
+    text, so the cost per line does not depend on how many terms there are.
+
+    goto[state] maps a character to the next trie state, fail[state] is the
+    longest proper suffix of the state's string that is also a trie state,
+    and out[state] lists the terms ending at that state (fail outputs are
+    merged in at build time).
+    """
+
+    def __init__(self, terms):
+        self.terms = list(terms)
+        self.lengths = [len(term) for term in self.terms]
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [()]
+
+        for term_id, term in enumerate(self.terms):
+            state = 0
+            for ch in term:
+                nxt = self.goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto[state][ch] = nxt
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.out.append(())
+                state = nxt
+            self.out[state] += (term_id,)
+
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self.goto[state].items():
+                queue.append(nxt)
+                fallback = self.fail[state]
+                while fallback and ch not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[nxt] = self.goto[fallback].get(ch, 0)
+                self.out[nxt] += self.out[self.fail[nxt]]
+
+    def __len__(self):
+        return len(self.terms)
+
+    def iter_matches(self, text):
+        """
+        Yields (start, end, term_id) for every occurrence, overlapping ones
+        included.
+        """
+        goto = self.goto
+        fail = self.fail
+        out = self.out
+        lengths = self.lengths
+        state = 0
+        for pos, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for term_id in out[state]:
+                yield pos + 1 - lengths[term_id], pos + 1, term_id
+
+
+### -------------------------------
+# 3. Term Matcher
+### -------------------------------
+class TermMatcher:
+    """
+    Whole-word term search on top of AhoCorasick. A match needs a non
+    alphanumeric character (or the line edge) on both sides; prefix terms
+    only need one on the left, and their match runs on to the end of the
+    word unless that word is in `allowed`. Boundaries are checked in the
+    original text, so leet symbols like "!" still end a word ("crap!").
+    """
+
+    def __init__(self, terms, leet=True, allowed=()):
+        self.leet = leet
+        self.prefix = {}
+        for term, prefix in terms:
+            term = normalize_text(term, leet)
+            self.prefix[term] = self.prefix.get(term, False) or prefix
+        self.allowed = {normalize_text(word, leet) for word in allowed}
+        self.automaton = AhoCorasick(self.prefix)
+
+    def find(self, text):
+        """
+        Returns [{"start", "end", "text", "term"}] character spans into text,
+        longest match first where matches overlap.
+        """
+        norm = normalize_text(text, self.leet)
+        size = len(norm)
+        found = []
+        for start, end, term_id in self.automaton.iter_matches(norm):
+            if start > 0 and text[start - 1].isalnum():
+                continue
+            term = self.automaton.terms[term_id]
+            if end < size and text[end].isalnum():
+                if not self.prefix[term]:
+                    continue
+                while end < size and text[end].isalnum():
+                    end += 1
+                if norm[start:end] in self.allowed:
+                    continue
+            found.append((start, end, term))
+
+        spans = []
+        last_end = 0
+        for start, end, term in sorted(found, key=lambda m: (m[0], -m[1])):
+            if start < last_end:
+                continue
+            spans.append({"start": start, "end": end, "text": text[start:end], "term": term})
+            last_end = end
+        return spans
+
+
+### -------------------------------
+# 4. Annotate a Song
+### -------------------------------
+def detect_profanity(song, matcher):
+    """
+    Adds "profanity" spans to every line of a preprocessed song, or a
+    song-level list with line indices for a raw {"lyrics": [...]} record,
+    plus "profanity_count". Returns a Counter of hits per term.
+    """
+    counts = Counter()
+    if "lines" in song:
+        for line in song["lines"]:
+            line["profanity"] = matcher.find(line["text"])
+            counts.update(span["term"] for span in line["profanity"])
+    else:
+        song["profanity"] = []
+        for idx, text in enumerate(song.get("lyrics", [])):
+            for span in matcher.find(text):
+                song["profanity"].append(dict(span, line=idx))
+                counts[span["term"]] += 1
+    song["profanity_count"] = sum(counts.values())
+    return counts
+
+
+### -------------------------------
+# 5. Chunk Worker
+### -------------------------------
+WORKER_CONFIG = {"terms_path": DEFAULT_TERMS, "leet": True, "matcher": None}
+
+
+def init_worker(config):
+    WORKER_CONFIG.update(config)
+    terms, allowed = load_terms(WORKER_CONFIG["terms_path"])
+    WORKER_CONFIG["matcher"] = TermMatcher(terms, WORKER_CONFIG["leet"], allowed)
+
+
+def annotate_chunk(raw_lines):
+    """
+    Returns (output text, hits per term, songs with hits, input bytes).
+    """
+    out = []
+    counts = Counter()
+    flagged = 0
+    for raw in raw_lines:
+        song = json.loads(raw)
+        song_counts = detect_profanity(song, WORKER_CONFIG["matcher"])
+        counts.update(song_counts)
+        flagged += bool(song_counts)
+        out.append(json.dumps(song) + "\n")
+    return "".join(out), counts, flagged, sum(len(raw) for raw in raw_lines)
+
+
+### -------------------------------
+# 6. Main Pipeline
+### -------------------------------
+def main():
+    parser = argparse.ArgumentParser(description="Annotate profanity and other listed terms in every lyric line")
+    parser.add_argument("--input", default="preprocessed.jsonl")
+    parser.add_argument("--output", default="profanity.jsonl")
+    parser.add_argument("--terms", default=DEFAULT_TERMS,
+                        help="Terms file: one term per line, trailing * for prefixes, leading - for allowed words")
+    parser.add_argument("--no-leet", action="store_true", help="Match the text as written, without leet mapping")
+    parser.add_argument("--report", default=None, help="Also save the corpus-wide counts as JSON")
+    parser.add_argument("--checkpoint", default=None)
+    parser.add_argument("--flush-every", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--chunk-size", type=int, default=64)
+    args = parser.parse_args()
+
+    config = {"terms_path": args.terms, "leet": not args.no_leet}
+    counts = Counter()
+    songs = 0
+    flagged = 0
+    scanned = 0
+
+    start = time.perf_counter()
+    with StreamWriter(args.output, args.checkpoint, args.flush_every) as writer:
+        chunks = map_chunks(annotate_chunk, args.input, writer.resume_offset, args.workers,
+                            args.chunk_size, init_worker, (config,))
+        for (text, chunk_counts, chunk_flagged, chunk_bytes), offset, count in chunks:
+            writer.write(text, offset, count)
+            counts.update(chunk_counts)
+            songs += count
+            flagged += chunk_flagged
+            scanned += chunk_bytes
+    elapsed = time.perf_counter() - start
+
+    for term, hits in counts.most_common():
+        print(f"{term}: {hits}")
+    print(f"{sum(counts.values())} hits in {flagged}/{songs} songs")
+    print(f"Scanned {scanned / 1e6:.1f} MB in {elapsed:.2f}s ({scanned / 1e6 / max(elapsed, 1e-9):.1f} MB/s)")
+
+    if args.report:
+        report = {"songs": songs, "flagged_songs": flagged, "hits": sum(counts.values()), "terms": dict(counts)}
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    print(f"Saved profanity annotations to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
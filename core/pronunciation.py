@@ -0,0 +1,219 @@
+import json
+import os
+import re
+from functools import lru_cache
+
+try:
+    import pronouncing
+except ImportError:
+    pronouncing = None
+
+
+VOWEL_GROUP = re.compile(r"[aeiouy]+")
+GRAPHEME_GROUP = re.compile(r"[aeiouy]+|[^aeiouy]+")
+
+# Spelling -> ARPAbet for guess_phonemes. Vowel groups missing here are
+# read from their first letter; upper-case values are already long vowels.
+VOWEL_SOUNDS = {
+    "a": "AE", "e": "EH", "i": "IH", "o": "AA", "u": "AH", "y": "IY",
+    "ai": "EY", "ay": "EY", "ea": "IY", "ee": "IY", "ey": "EY", "ie": "IY",
+    "oa": "OW", "oe": "OW", "oi": "OY", "oo": "UW", "ou": "AW", "oy": "OY",
+    "ue": "UW", "ui": "UW", "uy": "AY",
+    "A": "EY", "E": "IY", "I": "AY", "O": "OW", "U": "UW", "Y": "AY",
+}
+DIGIT_NAMES = ["zero", "one", "two", "three", "four", "five", "six", "seven", "eight", "nine"]
+LONG_VOWELS = {vowel: vowel.upper() for vowel in "aeiouy"}
+CONSONANT_SOUNDS = {
+    "b": "B", "c": "K", "d": "D", "f": "F", "g": "G", "h": "HH", "j": "JH", "k": "K", "l": "L",
+    "m": "M", "n": "N", "p": "P", "q": "K", "r": "R", "s": "S", "t": "T", "v": "V", "w": "W",
+    "x": "K S", "z": "Z",
+    "ch": "CH", "ck": "K", "gh": "G", "ng": "NG", "ph": "F", "sh": "SH", "th": "TH", "wh": "W",
+}
+
+
+### -------------------------------
+# 1. Pronunciation Sources
+### -------------------------------
+def load_cmudict(filepath):
+    """
+    Reads a CMUdict-format file ("WORD  P1 P2 ...") into {word: phonemes}.
+    Only the first pronunciation of each word is kept.
+    """
+    entries = {}
+    with open(filepath, "r", encoding="latin-1") as f:
+        for line in f:
+            if not line.strip() or line.startswith(";;;"):
+                continue
+            word, _, phones = line.strip().partition(" ")
+            word = word.lower()
+            if word.endswith(")"):  # alternate pronunciation, e.g. "live(2)"
+                continue
+            entries.setdefault(word, phones.split())
+    return entries
+
+
+def pronouncing_phones(word):
+    """
+    Falls back to the `pronouncing` package's bundled CMUdict when installed.
+    """
+    if pronouncing is None:
+        return None
+    phones = pronouncing.phones_for_word(word)
+    return phones[0].split() if phones else None
+
+
+### -------------------------------
+# 2. Word Records
+### -------------------------------
+def rhyme_ending(phonemes):
+    """
+    Phonemes from the last stressed vowel onwards; the whole word when
+    nothing is stressed.
+    """
+    for idx in range(len(phonemes) - 1, -1, -1):
+        if phonemes[idx][-1] in "12":
+            return " ".join(phonemes[idx:])
+    return " ".join(phonemes)
+
+
+def word_record(text, phonemes):
+    stress = "".join(p[-1] for p in phonemes if p[-1].isdigit())
+    return {
+        "text": text,
+        "phonemes": phonemes,
+        "syllables": len(stress),
+        "stress": stress,
+        "rhyme_ending": rhyme_ending(phonemes),
+    }
+
+
+def guess_phonemes(text):
+    """
+    ARPAbet phonemes guessed from the spelling, so guesses share the
+    dictionary's alphabet: each vowel group becomes one vowel and the last
+    one carries the stress, consonant clusters are read letter by letter
+    ("outside" -> AW0 T S AY1 D). A final silent "e" lengthens the vowel
+    before it. Words that are spelled alike at the end get the same rhyme
+    ending. Digits are read as their names.
+    """
+    letters = re.sub(r"[0-9]", lambda m: DIGIT_NAMES[int(m.group())], text.lower())
+    letters = re.sub(r"[^a-z]", "", letters)
+    groups = GRAPHEME_GROUP.findall(letters)
+    vowels = [k for k, group in enumerate(groups) if VOWEL_GROUP.fullmatch(group)]
+    if len(vowels) > 1 and groups[-1] == "e" and vowels[-1] == len(groups) - 1:
+        groups.pop()
+        vowels.pop()
+        if len(groups[vowels[-1]]) == 1 and len(groups[-1]) == 1:
+            groups[vowels[-1]] = LONG_VOWELS.get(groups[vowels[-1]], groups[vowels[-1]])
+
+    phonemes = []
+    for k, group in enumerate(groups):
+        if k in vowels:
+            vowel = VOWEL_SOUNDS.get(group) or VOWEL_SOUNDS[group[0]]
+            phonemes.append(vowel + ("1" if k == vowels[-1] else "0"))
+        else:
+            phonemes.extend(consonant_phonemes(group))
+    return phonemes
+
+
+def consonant_phonemes(cluster):
+    """
+    ARPAbet consonants for a run of consonant letters; doubled letters
+    ("tt") are one sound.
+    """
+    phonemes = []
+    pos = 0
+    while pos < len(cluster):
+        if cluster[pos:pos + 2] in CONSONANT_SOUNDS:
+            sounds = CONSONANT_SOUNDS[cluster[pos:pos + 2]]
+            pos += 2
+        else:
+            sounds = CONSONANT_SOUNDS[cluster[pos]]
+            pos += 1
+        for sound in sounds.split():
+            if not phonemes or phonemes[-1] != sound:
+                phonemes.append(sound)
+    return phonemes
+
+
+def guess_record(text):
+    """
+    Record for words missing from the dictionary (slang, ad-libs, "walkin"),
+    built from guess_phonemes and marked "guessed" so it can be replaced
+    once a dictionary knows the word.
+    """
+    record = word_record(text, guess_phonemes(text))
+    record["guessed"] = True
+    return record
+
+
+def is_guess(record):
+    """
+    True for guess_record output, including tables saved before guesses
+    were marked (spelling as the only phoneme, no stress).
+    """
+    return record.get("guessed", False) or (not record["stress"] and record["phonemes"] == [record["text"].upper()])
+
+
+### -------------------------------
+# 3. Cached Vocabulary Table
+### -------------------------------
+class PronunciationTable:
+    """
+    On-disk table of precomputed word records ({word: record} JSON).
+
+    Words are resolved once, through the table, then the CMUdict entries,
+    then guess_record. Dictionary results are kept in the table; guesses
+    are only cached for this run, so a later run with a dictionary resolves
+    those words properly. Repeated lookups
+    of the same token hit an LRU cache, so common words like "i" and "got"
+    are resolved once per run instead of once per occurrence.
+
+    With remember=False new words are not added to the table, so a
+    long-running process only holds the LRU cache's worth of them.
+    """
+
+    def __init__(self, table_path=None, cmudict=None, cache_size=65536, remember=True):
+        self.table_path = table_path
+        self.cmudict = cmudict or {}
+        self.records = {}
+        self.added = 0
+        self.remember = remember
+
+        if table_path and os.path.exists(table_path):
+            with open(table_path, "r", encoding="utf-8") as f:
+                self.records = json.load(f)
+
+        if not self.cmudict and pronouncing is None:
+            print("⚠️ No CMUdict file and no `pronouncing` package: words missing from the table "
+                  "get spelling-based pronunciations")
+
+        self.lookup = lru_cache(maxsize=cache_size)(self.resolve)
+
+    def resolve(self, text):
+        record = self.records.get(text)
+        if record is not None and not is_guess(record):
+            return record
+
+        key = text.strip("'-")
+        phonemes = self.cmudict.get(key) or pronouncing_phones(key)
+        if not phonemes:
+            return guess_record(text)
+
+        record = word_record(text, phonemes)
+        if self.remember:
+            self.records[text] = record
+            self.added += 1
+        return record
+
+    def save(self):
+        stale = [text for text, record in self.records.items() if is_guess(record)]
+        for text in stale:
+            del self.records[text]
+        if not self.table_path or not (self.added or stale):
+            return
+        tmp_path = self.table_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.records, f, ensure_ascii=False)
+        os.replace(tmp_path, self.table_path)
+        print(f"✅ Saved {len(self.records)} words ({self.added} new) to {self.table_path}")
@@ -0,0 +1,326 @@
+import argparse
+import json
+import os
+import time
+from array import array
+
+import Levenshtein
+import numpy as np
+
+from jsonl_stream import iter_jsonl_offsets
+from vocabulary import Vocabulary, last_word
+
+
+INDEX_FILE = "index.json"
+KEY_PHONEMES = 4  # trailing phonemes packed into each uint64 suffix key
+CODE_BITS = 16  # bits per phoneme code, so any symbol table below 2**16 fits
+
+
+### -------------------------------
+# 1. Phoneme Encoding
+### -------------------------------
+def ending_chars(codes):
+    """
+    One character per phoneme, so Levenshtein counts phoneme edits.
+    """
+    return ''.join(chr(0x100 + code) for code in codes)
+
+
+def suffix_key(codes):
+    """
+    Packs the last KEY_PHONEMES phoneme codes, last phoneme first, into one
+    uint64. Endings sharing a suffix of k <= KEY_PHONEMES phonemes then
+    form one contiguous range of the sorted keys.
+    """
+    key = 0
+    tail = list(reversed(codes[-KEY_PHONEMES:]))
+    for pos in range(KEY_PHONEMES):
+        key = (key << CODE_BITS) | (tail[pos] + 1 if pos < len(tail) else 0)
+    return key
+
+
+def suffix_range(codes, k):
+    """
+    (low, high) keys bounding every ending whose last k phonemes are
+    codes[-k:]; k is capped at KEY_PHONEMES.
+    """
+    k = min(k, KEY_PHONEMES)
+    low = suffix_key(codes[-k:])
+    return low, low | ((1 << (CODE_BITS * (KEY_PHONEMES - k))) - 1)
+
+
+### -------------------------------
+# 2. Build
+### -------------------------------
+def build_bk_tree(strings):
+    """
+    BK-tree over `strings` under Levenshtein distance, rooted at string 0.
+    Returns {node: {distance: child}}.
+    """
+    children = {}
+    for node in range(1, len(strings)):
+        current = 0
+        while True:
+            distance = Levenshtein.distance(strings[node], strings[current])
+            edges = children.setdefault(current, {})
+            if distance not in edges:
+                edges[distance] = node
+                break
+            current = edges[distance]
+    return children
+
+
+def build_index(input_path, output_dir, vocab=None):
+    """
+    Streams rhyme_annotated.jsonl once and writes the index directory:
+
+        rhyme_index/
+            index.json              phoneme symbols, key layout, counts, source file
+            ending_codes.npy        uint16 phoneme codes of every distinct ending (CSR)
+            ending_indptr.npy
+            suffix_keys.npy         sorted uint64 suffix keys
+            suffix_endings.npy      ending id for each sorted key
+            posting_lines.npy       line numbers grouped by ending (CSR)
+            posting_indptr.npy
+            line_offsets.npy        byte offset of each line's song
+            line_ids.npy            line_id within that song
+            bk_indptr.npy           BK-tree children (CSR)
+            bk_children.npy
+            bk_distances.npy
+    """
+    symbols = {}
+    endings = {}
+    line_offsets = array('q')
+    line_ids = array('q')
+    line_endings = array('q')
+
+    song_offset = 0
+    for song, end_offset in iter_jsonl_offsets(input_path):
+        for line in song["lines"]:
+            word = last_word(line, vocab)
+            if word is None or not word["rhyme_ending"].split():
+                continue
+            ending = tuple(symbols.setdefault(p, len(symbols)) for p in word["rhyme_ending"].split())
+            line_offsets.append(song_offset)
+            line_ids.append(line["line_id"])
+            line_endings.append(endings.setdefault(ending, len(endings)))
+        song_offset = end_offset
+
+    if len(symbols) > (1 << CODE_BITS) - 1:
+        raise ValueError(f"{len(symbols)} phoneme symbols do not fit in a suffix key")
+
+    os.makedirs(output_dir, exist_ok=True)
+
+    def save(name, values, dtype):
+        np.save(os.path.join(output_dir, f"{name}.npy"), np.asarray(values, dtype=dtype))
+
+    ending_list = list(endings)
+    lengths = np.array([len(e) for e in ending_list], dtype=np.int64)
+    save("ending_codes", [c for e in ending_list for c in e], np.uint16)
+    save("ending_indptr", np.concatenate([[0], np.cumsum(lengths)]), np.int64)
+
+    keys = np.array([suffix_key(e) for e in ending_list], dtype=np.uint64)
+    order = np.argsort(keys, kind="stable")
+    save("suffix_keys", keys[order], np.uint64)
+    save("suffix_endings", order, np.int32)
+
+    line_endings = np.frombuffer(line_endings, dtype=np.int64)
+    save("posting_lines", np.argsort(line_endings, kind="stable"), np.int64)
+    save("posting_indptr", np.concatenate([[0], np.cumsum(np.bincount(line_endings, minlength=len(ending_list)))]),
+         np.int64)
+    save("line_offsets", line_offsets, np.int64)
+    save("line_ids", line_ids, np.int32)
+
+    children = build_bk_tree([ending_chars(e) for e in ending_list])
+    bk_indptr = [0]
+    bk_children = []
+    bk_distances = []
+    for node in range(len(ending_list)):
+        edges = sorted(children.get(node, {}).items())
+        bk_distances.extend(distance for distance, _ in edges)
+        bk_children.extend(child for _, child in edges)
+        bk_indptr.append(len(bk_children))
+    save("bk_indptr", bk_indptr, np.int64)
+    save("bk_children", bk_children, np.int32)
+    save("bk_distances", bk_distances, np.int32)
+
+    meta = {
+        "source": os.path.abspath(input_path),
+        "symbols": list(symbols),
+        "suffix_key": [KEY_PHONEMES, CODE_BITS],
+        "endings": len(ending_list),
+        "lines": len(line_offsets),
+    }
+    with open(os.path.join(output_dir, INDEX_FILE), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+    return meta
+
+
+### -------------------------------
+# 3. Memory-Mapped Index
+### -------------------------------
+class RhymeIndex:
+    """
+    Read side of build_index. Every array is memory-mapped, so loading is
+    instant and only the pages a query touches are read.
+    """
+
+    ARRAYS = ["ending_codes", "ending_indptr", "suffix_keys", "suffix_endings", "posting_lines",
+              "posting_indptr", "line_offsets", "line_ids", "bk_indptr", "bk_children", "bk_distances"]
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, INDEX_FILE), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        if self.meta.get("suffix_key") != [KEY_PHONEMES, CODE_BITS]:
+            raise ValueError(f"{directory} was built with another suffix key layout; rebuild it")
+        self.symbols = {symbol: code for code, symbol in enumerate(self.meta["symbols"])}
+        for name in self.ARRAYS:
+            setattr(self, name, np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r"))
+
+    def __len__(self):
+        return self.meta["lines"]
+
+    def encode(self, rhyme_ending):
+        """
+        Phoneme codes for a rhyme ending string. Unknown phonemes get codes
+        past the symbol table, so they match nothing exactly.
+        """
+        codes = []
+        for phoneme in rhyme_ending.split():
+            codes.append(self.symbols.get(phoneme, len(self.symbols) + len(codes)))
+        return codes
+
+    def ending(self, ending_id):
+        start, stop = self.ending_indptr[ending_id], self.ending_indptr[ending_id + 1]
+        return ' '.join(self.meta["symbols"][c] for c in self.ending_codes[start:stop])
+
+    def ending_codes_of(self, ending_id):
+        return self.ending_codes[self.ending_indptr[ending_id]:self.ending_indptr[ending_id + 1]].tolist()
+
+    # --- exact suffix buckets ---
+    def suffix_endings_for(self, rhyme_ending, min_match_phonemes=2):
+        """
+        Ids of the distinct endings whose last min_match_phonemes phonemes
+        equal those of rhyme_ending, the same test detect_rhyme_groups uses.
+        """
+        if min_match_phonemes <= 0:
+            return list(range(self.meta["endings"]))
+        codes = self.encode(rhyme_ending)
+        k = min_match_phonemes
+        if len(codes) < k or max(codes[-k:]) >= len(self.symbols):
+            return []
+        low, high = suffix_range(codes, k)
+        start = np.searchsorted(self.suffix_keys, np.uint64(low), side="left")
+        stop = np.searchsorted(self.suffix_keys, np.uint64(high), side="right")
+        found = self.suffix_endings[start:stop].tolist()
+        if k > KEY_PHONEMES:
+            found = [e for e in found if self.ending_codes_of(e)[-k:] == codes[-k:]]
+        return found
+
+    # --- slant rhymes ---
+    def similar_endings(self, rhyme_ending, max_distance=1):
+        """
+        (ending id, phoneme edit distance) for every distinct ending within
+        max_distance of rhyme_ending, found by walking the BK-tree.
+        """
+        if not self.meta["endings"]:
+            return []
+        query = ending_chars(self.encode(rhyme_ending))
+        found = []
+        stack = [0]
+        while stack:
+            node = stack.pop()
+            distance = Levenshtein.distance(query, ending_chars(self.ending_codes_of(node)))
+            if distance <= max_distance:
+                found.append((node, distance))
+            start, stop = self.bk_indptr[node], self.bk_indptr[node + 1]
+            distances = self.bk_distances[start:stop]
+            lo = start + np.searchsorted(distances, distance - max_distance, side="left")
+            hi = start + np.searchsorted(distances, distance + max_distance, side="right")
+            stack.extend(self.bk_children[lo:hi].tolist())
+        return sorted(found, key=lambda item: (item[1], item[0]))
+
+    # --- lines ---
+    def lines_for(self, ending_ids, limit=None):
+        lines = []
+        for ending_id in ending_ids:
+            start, stop = self.posting_indptr[ending_id], self.posting_indptr[ending_id + 1]
+            lines.extend(self.posting_lines[start:stop].tolist())
+            if limit is not None and len(lines) >= limit:
+                return lines[:limit]
+        return lines
+
+    def locate(self, line):
+        """
+        (byte offset of the song in the source file, line_id).
+        """
+        return int(self.line_offsets[line]), int(self.line_ids[line])
+
+    def resolve(self, line, source=None):
+        """
+        Reads back the song a line came from and returns a small summary.
+        """
+        offset, line_id = self.locate(line)
+        with open(source or self.meta["source"], "rb") as f:
+            f.seek(offset)
+            raw = f.readline()
+            while raw and not raw.strip():
+                raw = f.readline()
+        song = json.loads(raw)
+        text = next((l["text"] for l in song["lines"] if l["line_id"] == line_id), None)
+        return {"artist": song.get("artist"), "title": song.get("title"), "line_id": line_id, "text": text}
+
+    def query(self, rhyme_ending, min_match_phonemes=2, max_distance=0, limit=20):
+        """
+        Lines ending in an exact-suffix rhyme of rhyme_ending, followed by
+        slant rhymes within max_distance phoneme edits, best first.
+        """
+        exact = self.suffix_endings_for(rhyme_ending, min_match_phonemes)
+        seen = set(exact)
+        slant = [e for e, _ in self.similar_endings(rhyme_ending, max_distance) if e not in seen] \
+            if max_distance > 0 else []
+        return self.lines_for(exact + slant, limit)
+
+
+### -------------------------------
+# 4. Main
+### -------------------------------
+def main():
+    parser = argparse.ArgumentParser(description="Build or query a corpus-wide rhyme index")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build = sub.add_parser("build", help="Index every line-final rhyme ending of an annotated corpus")
+    build.add_argument("--input", default="rhyme_annotated.jsonl")
+    build.add_argument("--output", default="rhyme_index")
+    build.add_argument("--vocab", default=None, help="Vocabulary file for songs stored as word_ids")
+
+    query = sub.add_parser("query", help="Find lines that rhyme with an ending")
+    query.add_argument("--index", default="rhyme_index")
+    query.add_argument("--ending", required=True, help='Rhyme ending phonemes, e.g. "AY1 T"')
+    query.add_argument("--min-match", type=int, default=2)
+    query.add_argument("--max-distance", type=int, default=1,
+                       help="Also return slant rhymes within this many phoneme edits")
+    query.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        start = time.perf_counter()
+        vocab = Vocabulary.load(args.vocab) if args.vocab else None
+        meta = build_index(args.input, args.output, vocab)
+        print(f"Indexed {meta['lines']} lines, {meta['endings']} distinct endings "
+              f"in {time.perf_counter() - start:.1f}s to {args.output}")
+        return
+
+    index = RhymeIndex(args.index)
+    start = time.perf_counter()
+    lines = index.query(args.ending, args.min_match, args.max_distance, args.limit)
+    elapsed = (time.perf_counter() - start) * 1000
+    for line in lines:
+        hit = index.resolve(line)
+        print(f"{hit['artist']} - {hit['title']} [{hit['line_id']}]: {hit['text']}")
+    print(f"{len(lines)} lines in {elapsed:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
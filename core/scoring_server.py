@@ -0,0 +1,390 @@
+import argparse
+import asyncio
+import json
+
+import numpy as np
+
+from feature_matrix import compute_feature_columns, pair_indices
+from preprocessor import tokenize
+from pronunciation import PronunciationTable, load_cmudict
+from vocabulary import last_word
+
+
+WORD_FIELDS = {
+    'text': str,
+    'phonemes': list,
+    'stress': str,
+    'syllables': int,
+    'rhyme_ending': str,
+}
+
+SCORE_FEATURES = [
+    'exact_match',
+    'ending_length_min',
+    'phoneme_similarity',
+    'stress_match',
+    'stress_similarity',
+    'syllable_diff',
+]
+
+
+### -------------------------------
+# 1. Models
+### -------------------------------
+class ThresholdModel:
+    """
+    Rule used when no trained model is given: a pair's score is 1 when the
+    rhyme endings match exactly, its phoneme_similarity otherwise.
+    """
+
+    def __init__(self, threshold=0.75):
+        self.threshold = threshold
+
+    def score(self, columns):
+        return np.maximum(columns['exact_match'], columns['phoneme_similarity']).astype(np.float64)
+
+
+class LogisticModel:
+    """
+    Logistic regression over the labeller features, loaded from JSON:
+
+        {"features": ["exact_match", ...], "weights": [...], "bias": 0.0, "threshold": 0.5}
+    """
+
+    def __init__(self, features, weights, bias=0.0, threshold=0.5):
+        self.features = features
+        self.weights = np.asarray(weights, dtype=np.float64)
+        self.bias = bias
+        self.threshold = threshold
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r", encoding="utf-8") as f:
+            spec = json.load(f)
+        return cls(spec["features"], spec["weights"], spec.get("bias", 0.0), spec.get("threshold", 0.5))
+
+    def score(self, columns):
+        x = np.column_stack([columns[name].astype(np.float64) for name in self.features])
+        return 1.0 / (1.0 + np.exp(-(x @ self.weights + self.bias)))
+
+
+### -------------------------------
+# 2. Micro-Batcher
+### -------------------------------
+class PairScorer:
+    """
+    Collects scoring requests into micro-batches. The first request of a
+    batch waits at most max_wait seconds for others to join, or until
+    max_pairs pairs are pending. Each batch is encoded and scored with one
+    compute_feature_columns call, and every word is looked up through the
+    pronunciation table's LRU cache.
+    """
+
+    def __init__(self, table, model, max_pairs=4096, max_wait=0.002):
+        self.table = table
+        self.model = model
+        self.max_pairs = max_pairs
+        self.max_wait = max_wait
+        self.queue = asyncio.Queue()
+        self.batches = 0
+        self.requests = 0
+        self.pairs = 0
+
+    def record(self, word):
+        return self.table.lookup(word.lower())
+
+    async def score(self, words, left, right):
+        """
+        Scores pairs (words[left[p]], words[right[p]]) where words are word
+        records. Returns (scores, feature columns).
+        """
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((words, left, right, future))
+        return await future
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            pending = len(batch[0][1])
+            deadline = loop.time() + self.max_wait
+            while pending < self.max_pairs:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                batch.append(item)
+                pending += len(item[1])
+
+            try:
+                results = await loop.run_in_executor(None, self.score_batch, batch)
+            except Exception as e:
+                if len(batch) == 1:
+                    results = [e]
+                else:
+                    # Score the requests one by one so only the bad one fails
+                    results = []
+                    for item in batch:
+                        try:
+                            results.extend(await loop.run_in_executor(None, self.score_batch, [item]))
+                        except Exception as item_error:
+                            results.append(item_error)
+            for (*_, future), result in zip(batch, results):
+                if future.done():
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+    def score_batch(self, batch):
+        """
+        One vectorised pass over every pair in the batch. Words shared by
+        several requests are encoded once; records are only shared when
+        every field in WORD_FIELDS matches, so a request scores the same
+        whatever it is batched with.
+        """
+        index = {}
+        words = []
+        lefts = []
+        rights = []
+        for request_words, left, right, _ in batch:
+            ids = []
+            for record in request_words:
+                key = tuple(tuple(v) if isinstance(v, list) else v
+                            for v in (record[field] for field in WORD_FIELDS))
+                k = index.get(key)
+                if k is None:
+                    k = index[key] = len(words)
+                    words.append(dict(record, rhyme_id=None))
+                ids.append(k)
+            ids = np.asarray(ids, dtype=np.int64)
+            lefts.append(ids[left])
+            rights.append(ids[right])
+
+        columns = compute_feature_columns(words, np.concatenate(lefts), np.concatenate(rights))
+        scores = self.model.score(columns)
+
+        self.batches += 1
+        self.requests += len(batch)
+        self.pairs += len(scores)
+
+        results = []
+        start = 0
+        for _, left, _, _ in batch:
+            stop = start + len(left)
+            results.append((scores[start:stop], {name: columns[name][start:stop] for name in SCORE_FEATURES}))
+            start = stop
+        return results
+
+
+### -------------------------------
+# 3. Request Handlers
+### -------------------------------
+def clean_record(record):
+    """
+    Checks a caller-supplied word record before it joins a shared batch and
+    keeps only the fields the features read. Raises ValueError.
+    """
+    if not isinstance(record, dict):
+        raise ValueError(f"word record must be an object, got {record!r}")
+    for field, kind in WORD_FIELDS.items():
+        if field not in record:
+            raise ValueError(f"word record is missing {field!r}")
+        if not isinstance(record[field], kind) or isinstance(record[field], bool):
+            raise ValueError(f"word record field {field!r} must be {kind.__name__}")
+    if not all(isinstance(p, str) for p in record['phonemes']):
+        raise ValueError("word record field 'phonemes' must be a list of strings")
+    return {field: record[field] for field in WORD_FIELDS}
+
+
+async def score_pairs(scorer, body):
+    """
+    {"pairs": [["night", "light"], ...]} -> a score and features per pair.
+    """
+    pairs = body["pairs"]
+    for pair in pairs:
+        if not (isinstance(pair, list) and len(pair) == 2 and all(isinstance(w, str) for w in pair)):
+            raise ValueError(f"each pair must be two words, got {pair!r}")
+    words = [scorer.record(word) for pair in pairs for word in pair]
+    left = np.arange(0, 2 * len(pairs), 2)
+    right = left + 1
+    scores, columns = await scorer.score(words, left, right)
+    threshold = scorer.model.threshold
+    return {"pairs": [
+        dict({"word1": w1, "word2": w2, "score": float(s), "rhyme": bool(s >= threshold)},
+             **{name: columns[name][k].item() for name in SCORE_FEATURES})
+        for k, ((w1, w2), s) in enumerate(zip(pairs, scores.tolist()))
+    ]}
+
+
+async def score_song(scorer, body):
+    """
+    {"lines": [...]} with text lines or preprocessed line records ->
+    every pair of line-final words scored as a rhyme, as [i, j, score].
+    """
+    words = []
+    line_ids = []
+    for idx, line in enumerate(body["lines"]):
+        if isinstance(line, str):
+            tokens = tokenize(line)
+            record = scorer.record(tokens[-1]) if tokens else None
+        else:
+            if not isinstance(line, dict):
+                raise ValueError(f"line {idx} must be text or a line record")
+            record = last_word(line)
+            record = clean_record(record) if record is not None else None
+        if record is not None:
+            words.append(record)
+            line_ids.append(idx)
+
+    left, right = pair_indices(len(words))
+    scores, _ = await scorer.score(words, left, right)
+    rhymes = np.flatnonzero(scores >= scorer.model.threshold)
+    return {
+        "lines": len(body["lines"]),
+        "pairs": len(scores),
+        "rhymes": [[line_ids[left[k]], line_ids[right[k]], float(scores[k])] for k in rhymes.tolist()],
+    }
+
+
+ROUTES = {
+    "/score": score_pairs,
+    "/score_song": score_song,
+}
+
+
+### -------------------------------
+# 4. HTTP/1.1 Server
+### -------------------------------
+async def read_request(reader):
+    """
+    Returns (method, path, headers, body), or None when the client closed
+    the connection. Raises ValueError for a malformed request.
+    """
+    request_line = await reader.readline()
+    if not request_line.strip():
+        return None
+    parts = request_line.decode("latin-1").split()
+    if len(parts) != 3:
+        raise ValueError(f"malformed request line {request_line.strip()[:100]!r}")
+    method, path, _ = parts
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    length = headers.get("content-length", "0")
+    if not length.isdigit():
+        raise ValueError(f"bad Content-Length {length[:100]!r}")
+    length = int(length)
+    body = await reader.readexactly(length) if length else b""
+    return method, path, headers, body
+
+
+def write_response(writer, status, payload, keep_alive=True):
+    body = json.dumps(payload).encode("utf-8")
+    reason = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed"}[status]
+    writer.write(
+        f"HTTP/1.1 {status} {reason}\r\n"
+        f"Content-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1") + body
+    )
+
+
+def handler(scorer):
+    async def handle(reader, writer):
+        try:
+            while True:
+                try:
+                    request = await read_request(reader)
+                except ValueError as e:
+                    # The rest of the stream cannot be trusted; answer and hang up
+                    write_response(writer, 400, {"error": str(e)}, keep_alive=False)
+                    await writer.drain()
+                    break
+                if request is None:
+                    break
+                method, path, headers, body = request
+                keep_alive = headers.get("connection", "").lower() != "close"
+
+                if method == "GET" and path == "/stats":
+                    status, payload = 200, {
+                        "requests": scorer.requests,
+                        "batches": scorer.batches,
+                        "pairs": scorer.pairs,
+                        "cache": scorer.table.lookup.cache_info()._asdict(),
+                    }
+                elif path not in ROUTES:
+                    status, payload = 404, {"error": f"unknown path {path}"}
+                elif method != "POST":
+                    status, payload = 405, {"error": "use POST"}
+                else:
+                    try:
+                        status, payload = 200, await ROUTES[path](scorer, json.loads(body))
+                    except (ValueError, KeyError, TypeError, IndexError) as e:
+                        status, payload = 400, {"error": str(e)}
+
+                write_response(writer, status, payload, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+    return handle
+
+
+async def serve(scorer, host="127.0.0.1", port=8765, unix_path=None):
+    batcher = asyncio.create_task(scorer.run())
+    if unix_path:
+        server = await asyncio.start_unix_server(handler(scorer), unix_path)
+        print(f"Scoring on unix:{unix_path}")
+    else:
+        server = await asyncio.start_server(handler(scorer), host, port)
+        print(f"Scoring on http://{host}:{port}")
+    async with server:
+        try:
+            await server.serve_forever()
+        finally:
+            batcher.cancel()
+
+
+### -------------------------------
+# 5. Main
+### -------------------------------
+def main():
+    parser = argparse.ArgumentParser(description="Serve rhyme-pair scores over HTTP with micro-batching")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", default=None, help="Listen on this Unix socket instead of TCP")
+    parser.add_argument("--table", default=None, help="Precomputed word -> record table")
+    parser.add_argument("--cmudict", default=None, help="CMUdict-format pronunciation file")
+    parser.add_argument("--cache-size", type=int, default=65536, help="Words kept in the LRU cache")
+    parser.add_argument("--model", default=None, help="Logistic model JSON; without it a threshold rule is used")
+    parser.add_argument("--threshold", type=float, default=0.75, help="Score needed to call a pair a rhyme")
+    parser.add_argument("--max-batch", type=int, default=4096, help="Pairs per micro-batch")
+    parser.add_argument("--max-wait-ms", type=float, default=2.0,
+                        help="How long a request may wait for others to join its batch")
+    args = parser.parse_args()
+
+    cmudict = load_cmudict(args.cmudict) if args.cmudict else None
+    table = PronunciationTable(args.table, cmudict, args.cache_size, remember=False)
+    model = LogisticModel.load(args.model) if args.model else ThresholdModel(args.threshold)
+    scorer = PairScorer(table, model, args.max_batch, args.max_wait_ms / 1000)
+
+    try:
+        asyncio.run(serve(scorer, args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
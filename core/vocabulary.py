@@ -0,0 +1,152 @@
+import argparse
+import json
+import os
+
+from jsonl_stream import StreamWriter, iter_jsonl_offsets
+
+
+### -------------------------------
+# 1. Word ID Vocabulary
+### -------------------------------
+def record_key(record):
+    return (record["text"], tuple(record["phonemes"]), record["stress"], record["syllables"],
+            record["rhyme_ending"])
+
+
+class Vocabulary:
+    """
+    Interns word records so songs can store a word ID instead of a full
+    phonemes/syllables/stress/rhyme_ending record per token.
+
+    Saved as JSONL where line k is the record for word ID k. Records are
+    interned by pronunciation as well as text, so a word seen with two
+    pronunciations (a dictionary entry and a spelling guess, or two
+    dictionaries) gets two IDs and compact -> expand gives back the
+    records that went in.
+    """
+
+    def __init__(self, records=None):
+        self.records = list(records or [])
+        self.ids = {}
+        for idx, record in enumerate(self.records):
+            self.ids.setdefault(record_key(record), idx)
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getitem__(self, word_id):
+        return self.records[word_id]
+
+    def id_for(self, record):
+        key = record_key(record)
+        word_id = self.ids.get(key)
+        if word_id is None:
+            word_id = len(self.records)
+            self.ids[key] = word_id
+            self.records.append(record)
+        return word_id
+
+    @classmethod
+    def load(cls, filepath):
+        if not os.path.exists(filepath):
+            return cls()
+        with open(filepath, "r", encoding="utf-8") as f:
+            return cls(json.loads(line) for line in f if line.strip())
+
+    def save(self, filepath):
+        tmp_path = filepath + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for record in self.records:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        os.replace(tmp_path, filepath)
+
+
+def used_records(song, vocab):
+    """
+    JSON of the vocabulary records a song's word IDs point at, in ID order.
+    Word IDs only mean something with the file that assigned them, so
+    caches keyed on compact songs include this. The vocabulary only grows,
+    so a song's entry stays valid until one of its own records changes.
+    """
+    word_ids = sorted({word_id for line in song["lines"] for word_id in line.get("word_ids", ())})
+    return json.dumps([[word_id, vocab[word_id]] for word_id in word_ids],
+                      ensure_ascii=False, sort_keys=True)
+
+
+### -------------------------------
+# 2. Reading Either Encoding
+### -------------------------------
+def line_words(line, vocab=None):
+    """
+    Word records of a line, whether it stores full "words" or "word_ids".
+    """
+    if "word_ids" in line:
+        return [vocab[word_id] for word_id in line["word_ids"]]
+    return line["words"]
+
+
+def last_word(line, vocab=None):
+    """
+    Record of the line's last word, or None for an empty line. Only the one
+    ID is resolved for compact lines.
+    """
+    if "word_ids" in line:
+        word_ids = line["word_ids"]
+        return vocab[word_ids[-1]] if word_ids else None
+    words = line["words"]
+    return words[-1] if words else None
+
+
+### -------------------------------
+# 3. Converting Songs
+### -------------------------------
+def replace_key(line, old_key, new_key, value):
+    """
+    Swaps one key of a line for another, keeping the original key order.
+    """
+    return {new_key if key == old_key else key: value if key == old_key else item
+            for key, item in line.items()}
+
+
+def compact_song(song, vocab):
+    song["lines"] = [
+        replace_key(line, "words", "word_ids", [vocab.id_for(word) for word in line["words"]])
+        if "words" in line else line
+        for line in song["lines"]
+    ]
+    return song
+
+
+def expand_song(song, vocab):
+    song["lines"] = [
+        replace_key(line, "word_ids", "words", line_words(line, vocab))
+        if "word_ids" in line else line
+        for line in song["lines"]
+    ]
+    return song
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert songs between full word records and vocabulary IDs")
+    parser.add_argument("mode", choices=["compact", "expand"])
+    parser.add_argument("--input", required=True)
+    parser.add_argument("--output", required=True)
+    parser.add_argument("--vocab", required=True)
+    args = parser.parse_args()
+
+    vocab = Vocabulary.load(args.vocab)
+    convert = compact_song if args.mode == "compact" else expand_song
+
+    song_count = 0
+    with StreamWriter(args.output) as writer:
+        for song, offset in iter_jsonl_offsets(args.input):
+            writer.write(json.dumps(convert(song, vocab)) + "\n", offset)
+            song_count += 1
+
+    if args.mode == "compact":
+        vocab.save(args.vocab)
+    print(f"Converted {song_count} songs to {args.output} ({len(vocab)} vocabulary entries)")
+
+
+if __name__ == "__main__":
+    main()
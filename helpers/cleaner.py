@@ -1,15 +1,9 @@
-import json
+from normalize import run_pipeline
 
 input_file = "lyrics_dataset.jsonl"
 output_file = "lyrics_dataset_cleaned.jsonl"
 
-with open(input_file, 'r', encoding='utf-8') as infile, open(output_file, 'w', encoding='utf-8') as outfile:
-    for line in infile:
-        try:
-            data = json.loads(line)
-            original_lyrics = data.get("lyrics", [])
-            cleaned_lyrics = [lyric_line for lyric_line in original_lyrics if "read more" not in lyric_line.lower()]
-            data["lyrics"] = cleaned_lyrics
-            outfile.write(json.dumps(data, ensure_ascii=False) + "\n")
-        except json.JSONDecodeError:
-            continue  # skip malformed lines
+# "read more" filtering is one stage of the normalize.py pipeline; run
+# normalize.py directly to clean, filter and swap in a single pass.
+kept, dropped = run_pipeline(input_file, output_file, ["read_more"])
+print(f"✓ Cleaned {kept} songs ({dropped} malformed lines skipped)")
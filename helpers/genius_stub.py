@@ -0,0 +1,231 @@
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import lyrics_grabber_large as grabber
+
+# === Stub catalogue ===
+CATALOGUE = [
+    ("Stub Artist", "Throttled Search", ["first line of the song", "second line of the song"]),
+    ("Stub Artist", "Flaky Page", ["the page fails once", "then it loads fine"]),
+    ("Stub Artist", "Broken Song", ["this song errors until", "the second run"]),
+    ("Other Artist", "Plain One", ["nothing special here", "just some lyrics"]),
+    ("Other Artist", "Plain Two", ["more words to fetch", "and write out once"]),
+]
+MISSING = ("Nobody", "Not On Genius")
+
+
+# === Stub server ===
+class StubGenius:
+    """
+    Serves the endpoints lyricsgenius uses for search_song: search/multi and
+    search on the public API, songs/<id> on the API and the song's lyrics
+    page on the web root.
+
+    fail[(kind, title)] is a list of status codes the next requests of that
+    kind ("search", "song" or "page") for that title get before the real
+    response. Every request is logged as (time, kind, title, status).
+    """
+
+    def __init__(self, catalogue):
+        self.songs = {}
+        for song_id, (artist, title, lines) in enumerate(catalogue, 1):
+            slug = f"{artist} {title} lyrics".lower().replace(" ", "-")
+            self.songs[song_id] = {
+                "id": song_id,
+                "title": title,
+                "full_title": f"{title} by {artist}",
+                "primary_artist": {"name": artist},
+                "lyrics_state": "complete",
+                "path": "/" + slug,
+                "url": "https://genius.com/" + slug,
+                "lines": lines,
+            }
+        self.fail = {}
+        self.log = []
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self.handler())
+
+    @property
+    def root(self):
+        host, port = self.server.server_address
+        return f"http://{host}:{port}/"
+
+    def requests_for(self, kind, title):
+        return [entry for entry in self.log if entry[1] == kind and entry[2] == title]
+
+    def result(self, song):
+        return {key: value for key, value in song.items() if key != "lines"}
+
+    def find(self, query):
+        return [song for song in self.songs.values()
+                if f"{song['title']} {song['primary_artist']['name']}" == query]
+
+    def respond(self, path, query):
+        """
+        Returns (kind, title, status, content type, body) for one GET.
+        """
+        parts = path.strip("/").split("/")
+        if parts[0] == "api":
+            parts = parts[1:]
+        if parts[:1] == ["search"]:
+            matches = self.find(query.get("q", [""])[0])
+            title = matches[0]["title"] if matches else None
+            hits = [{"index": "song", "type": "song", "result": self.result(song)} for song in matches]
+            if parts[1:] == ["multi"]:
+                body = {"sections": [{"type": "top_hit", "hits": hits}, {"type": "song", "hits": hits}]}
+            else:
+                body = {"hits": hits}
+            return "search", title, 200, "application/json", {"response": body}
+        if parts[:1] == ["songs"] and len(parts) == 2:
+            song = self.songs.get(int(parts[1]))
+            if song is None:
+                return "song", None, 404, "application/json", {"meta": {"status": 404}}
+            return "song", song["title"], 200, "application/json", {"response": {"song": self.result(song)}}
+        for song in self.songs.values():
+            if song["path"] == path:
+                html = ("<html><body><div data-lyrics-container=\"true\">"
+                        + "<br/>".join([f"{song['title']} Lyrics", *song["lines"]])
+                        + "</div></body></html>")
+                return "page", song["title"], 200, "text/html", html
+        return "page", None, 404, "text/html", "<html><body>Not found</body></html>"
+
+    def handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                kind, title, status, content_type, body = stub.respond(url.path, parse_qs(url.query))
+                with stub.lock:
+                    pending = stub.fail.get((kind, title))
+                    if pending:
+                        status = pending.pop(0)
+                        content_type, body = "application/json", {"meta": {"status": status}}
+                    stub.log.append((time.monotonic(), kind, title, status))
+                payload = (body if isinstance(body, str) else json.dumps(body)).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.server.shutdown()
+        self.server.server_close()
+        return False
+
+
+# === End-to-end run ===
+def read_jsonl(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def count_writers():
+    """
+    Wraps grabber.writer_task so the harness can see how many writers a
+    run starts.
+    """
+    calls = []
+    writer_task = grabber.writer_task
+
+    async def counted(*args, **kwargs):
+        calls.append(args)
+        return await writer_task(*args, **kwargs)
+
+    grabber.writer_task = counted
+    return calls
+
+
+def check_run(concurrency, rate, retries):
+    """
+    Runs the grabber twice against the stub. The first run sees a 429 on a
+    search, a 503 on a lyrics page and a song whose API lookup keeps
+    failing; the second run resumes from the manifest once that song is
+    fixed. Returns a list of failed checks.
+    """
+    failures = []
+
+    def check(ok, message):
+        print(f"{'✓' if ok else '✗'} {message}")
+        if not ok:
+            failures.append(message)
+
+    os.environ.setdefault("GENIUS_API_TOKEN", "stub")
+    songs = [(artist, title) for artist, title, _ in CATALOGUE] + [MISSING]
+    writers = count_writers()
+
+    with StubGenius(CATALOGUE) as stub, tempfile.TemporaryDirectory() as tmp:
+        output_path = os.path.join(tmp, "lyrics.jsonl")
+        manifest_path = os.path.join(tmp, "manifest.jsonl")
+        fetch = grabber.genius_fetcher(grabber.make_genius(stub.root))
+
+        stub.fail[("search", "Throttled Search")] = [429]
+        stub.fail[("page", "Flaky Page")] = [503]
+        stub.fail[("song", "Broken Song")] = [500] * (retries + 1)
+        stats = asyncio.run(grabber.run(songs, fetch, output_path, manifest_path, concurrency, rate, retries))
+
+        check(stats == {"done": 4, "failed": 2, "skipped": 0}, f"first run stats {stats}")
+        for kind, title, status in (("search", "Throttled Search", 429), ("page", "Flaky Page", 503)):
+            log = stub.requests_for(kind, title)
+            check([entry[3] for entry in log] == [status, 200], f"{title}: {status} on {kind} is retried once")
+            if len(log) == 2:
+                check(log[1][0] - log[0][0] >= 1.0, f"{title}: retry waits out the backoff")
+        broken = stub.requests_for("song", "Broken Song")
+        check(len(broken) == retries + 1, f"Broken Song: {retries + 1} attempts before giving up")
+
+        statuses = {(entry["artist"], entry["song"]): entry["status"] for entry in read_jsonl(manifest_path)}
+        check(statuses.get(("Stub Artist", "Broken Song")) == "error", "failed song is recorded as an error")
+        check(statuses.get(MISSING) == "not_found", "missing song is recorded as not found")
+
+        # Second run: everything but the failed song is skipped
+        seen = len(stub.log)
+        stats = asyncio.run(grabber.run(songs, fetch, output_path, manifest_path, concurrency, rate, retries))
+        check(stats == {"done": 1, "failed": 0, "skipped": 5}, f"resumed run stats {stats}")
+        check({entry[2] for entry in stub.log[seen:]} == {"Broken Song"}, "resumed run only requests the failed song")
+
+        records = read_jsonl(output_path)
+        pairs = [(record["artist"], record["song"]) for record in records]
+        check(len(pairs) == len(set(pairs)) == len(CATALOGUE), f"{len(records)} whole records, no duplicates")
+        check(all(record["lyrics"] for record in records), "every record has cleaned lyrics")
+        check(len(read_jsonl(manifest_path)) == len(songs) + 1, "one manifest line per attempt")
+        check(len(writers) == 2 and all(args[1:] == (output_path, manifest_path) for args in writers),
+              "each run writes through a single writer task")
+
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run lyrics_grabber_large end to end against a local stub of the Genius endpoints")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--rate", type=float, default=50.0)
+    parser.add_argument("--retries", type=int, default=2)
+    args = parser.parse_args()
+
+    failures = check_run(args.concurrency, args.rate, args.retries)
+    print("=" * 60)
+    if failures:
+        print(f"{len(failures)} check(s) failed")
+        raise SystemExit(1)
+    print("All checks passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,144 +1,248 @@
 import os
-import lyricsgenius
-from dotenv import load_dotenv
+import argparse
+import asyncio
 import csv
 import json
-import re
-import string
+import random
 import time
-from concurrent.futures import ThreadPoolExecutor
-import threading
 
-# === Setup ===
-load_dotenv(".env")
-token = os.getenv("GENIUS_API_TOKEN")
-
-genius = lyricsgenius.Genius(token)
-genius.verbose = False
-genius.remove_section_headers = True
+from normalize import clean_lyrics
 
 # === Config ===
 csv_file = "./assets/1000songswithartistname.csv"  # Your input CSV
 output_file = "lyrics_dataset.jsonl"
-max_workers = 3
-
-# Pre-compile regex for cleaning
-punct_to_remove = ''.join(c for c in string.punctuation if c not in {"'", "-"})
-punct_pattern = re.compile(f"[{re.escape(punct_to_remove)}]")
-
-# Thread-safe counter
-class Counter:
-    def __init__(self):
-        self.value = 0
-        self.success = 0
-        self.lock = threading.Lock()
-    
-    def increment(self, success=False):
-        with self.lock:
-            self.value += 1
-            if success:
-                self.success += 1
-
-counter = Counter()
-file_lock = threading.Lock()
-
-def clean_lyrics(lyrics):
-    if not lyrics:
-        return []
-    
-    cleaned_lines = []
-    for line in lyrics.split('\n')[1:]:  # Skip first line
-        line = line.lower().strip()
-        # Skip common non-lyric lines
-        if any(skip in line for skip in ['embed', 'you might also like', '[verse', '[chorus', '[bridge']):
-            continue
-        
-        line = punct_pattern.sub("", line)
-        line = re.sub(r'\s+', ' ', line).strip()
-        
-        if line and len(line) > 3:
-            cleaned_lines.append(line)
-    
-    return cleaned_lines
-
-def get_song_lyrics(artist, song_title, total_songs):
-    try:
-        # Search for the specific song
+manifest_file = "lyrics_manifest.jsonl"
+max_concurrency = 3
+requests_per_second = 2.0
+max_retries = 3
+
+
+# === Genius client ===
+def make_genius(api_root=None):
+    """
+    Builds the Genius client. api_root points every endpoint at another
+    server, e.g. a local stub for testing.
+    """
+    import lyricsgenius
+    from dotenv import load_dotenv
+
+    load_dotenv(".env")
+    token = os.getenv("GENIUS_API_TOKEN")
+
+    genius = lyricsgenius.Genius(token)
+    genius.verbose = False
+    genius.remove_section_headers = True
+    genius.sleep_time = 0  # pacing is done by the rate limiter
+    # lyricsgenius hands back a 429/5xx lyrics page as HTML with no lyrics,
+    # which would be recorded as not found; raise so the song is retried
+    genius._session.hooks["response"].append(raise_for_retryable)
+
+    if api_root:
+        root = api_root.rstrip("/") + "/"
+        genius.API_ROOT = root
+        genius.PUBLIC_API_ROOT = root + "api/"
+        genius.WEB_ROOT = root
+    return genius
+
+
+def raise_for_retryable(response, *args, **kwargs):
+    if response.status_code == 429 or response.status_code >= 500:
+        response.raise_for_status()
+
+
+def genius_fetcher(genius):
+    """
+    Returns a blocking fetch(artist, song_title) -> raw lyrics or None.
+    """
+    def fetch(artist, song_title):
         song = genius.search_song(song_title, artist)
-        
-        if song and song.lyrics:
-            cleaned = clean_lyrics(song.lyrics)
-            
-            if cleaned:  # Only save if we got actual lyrics
-                result = {
-                    "artist": artist,
-                    "song": song_title,
-                    "lyrics": cleaned
-                }
-                
-                # Thread-safe file writing
-                with file_lock:
-                    with open(output_file, 'a', encoding='utf-8') as f:
-                        f.write(json.dumps(result, ensure_ascii=False) + '\n')
-                
-                counter.increment(success=True)
-                print(f"✓ {counter.success}/{total_songs} - {artist} - {song_title}")
-                return True
-        
-        counter.increment()
-        print(f"✗ {counter.value}/{total_songs} - Failed: {artist} - {song_title}")
-        return False
-        
-    except Exception as e:
-        counter.increment()
-        print(f"✗ {counter.value}/{total_songs} - Error: {artist} - {song_title}")
-        return False
+        return song.lyrics if song else None
+    return fetch
+
+
+# === Rate limiting and retries ===
+class TokenBucket:
+    """
+    Allows `rate` requests per second on average, with bursts of up to
+    `capacity` requests.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+async def fetch_with_retries(fetch, bucket, artist, song_title, retries=max_retries, base_delay=1.0):
+    """
+    Runs the blocking fetch in a thread. Errors are retried with exponential
+    backoff and jitter; a song that simply is not found is not retried.
+    """
+    for attempt in range(retries + 1):
+        await bucket.acquire()
+        try:
+            return await asyncio.to_thread(fetch, artist, song_title)
+        except Exception:
+            if attempt == retries:
+                raise
+            await asyncio.sleep(base_delay * (2 ** attempt) * (1 + random.random()))
+
+
+# === Resume manifest ===
+def load_manifest(path):
+    """
+    (artist, song) pairs already finished, either saved or confirmed
+    missing. Songs that errored are retried on the next run.
+    """
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            if entry["status"] in ("ok", "not_found"):
+                done.add((entry["artist"], entry["song"]))
+    return done
+
+
+# === Single writer ===
+async def writer_task(queue, output_path, manifest_path, flush_every=20):
+    """
+    The only task that touches the output files. Receives
+    (result or None, manifest entry) items and a final None.
+    """
+    with open(output_path, 'a', encoding='utf-8') as out, open(manifest_path, 'a', encoding='utf-8') as manifest:
+        pending = 0
+        while True:
+            item = await queue.get()
+            if item is None:
+                break
+            result, entry = item
+            if result is not None:
+                out.write(json.dumps(result, ensure_ascii=False) + '\n')
+            manifest.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            pending += 1
+            if pending >= flush_every:
+                out.flush()
+                manifest.flush()
+                pending = 0
+
+
+# === Fetch one song ===
+async def get_song_lyrics(fetch, bucket, semaphore, queue, stats, artist, song_title, total_songs, retries):
+    async with semaphore:
+        entry = {"artist": artist, "song": song_title}
+        try:
+            lyrics = await fetch_with_retries(fetch, bucket, artist, song_title, retries)
+        except Exception as e:
+            stats["failed"] += 1
+            print(f"✗ {stats['done'] + stats['failed']}/{total_songs} - Error: {artist} - {song_title}")
+            await queue.put((None, dict(entry, status="error", error=str(e))))
+            return
+
+        cleaned = clean_lyrics(lyrics)
+        if cleaned:  # Only save if we got actual lyrics
+            stats["done"] += 1
+            print(f"✓ {stats['done']}/{total_songs} - {artist} - {song_title}")
+            result = {"artist": artist, "song": song_title, "lyrics": cleaned}
+            await queue.put((result, dict(entry, status="ok")))
+        else:
+            stats["failed"] += 1
+            print(f"✗ {stats['done'] + stats['failed']}/{total_songs} - Failed: {artist} - {song_title}")
+            await queue.put((None, dict(entry, status="not_found")))
+
+
+async def run(songs, fetch, output_path, manifest_path, concurrency=max_concurrency,
+              rate=requests_per_second, retries=max_retries):
+    """
+    Fetches every (artist, song) pair not already in the manifest.
+    Returns the counts of saved, failed and skipped songs.
+    """
+    done = load_manifest(manifest_path)
+    todo = [pair for pair in songs if pair not in done]
+    stats = {"done": 0, "failed": 0, "skipped": len(songs) - len(todo)}
+
+    bucket = TokenBucket(rate)
+    semaphore = asyncio.Semaphore(concurrency)
+    queue = asyncio.Queue(maxsize=concurrency * 4)
+    writer = asyncio.create_task(writer_task(queue, output_path, manifest_path))
+
+    await asyncio.gather(*(
+        get_song_lyrics(fetch, bucket, semaphore, queue, stats, artist, song, len(todo), retries)
+        for artist, song in todo
+    ))
+    await queue.put(None)
+    await writer
+    return stats
+
+
+def read_songs(path):
+    songs = []
+    with open(path, 'r', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        next(reader)  # Skip header
+        for row in reader:
+            if len(row) >= 2:
+                songs.append((row[0], row[1]))  # (artist, song)
+    return songs
+
 
 def main():
+    parser = argparse.ArgumentParser(description="Fetch lyrics for every song in the CSV")
+    parser.add_argument("--csv", default=csv_file)
+    parser.add_argument("--output", default=output_file)
+    parser.add_argument("--manifest", default=manifest_file,
+                        help="Finished songs are recorded here and skipped on the next run")
+    parser.add_argument("--concurrency", type=int, default=max_concurrency)
+    parser.add_argument("--rate", type=float, default=requests_per_second,
+                        help="Song lookups per second across all workers")
+    parser.add_argument("--retries", type=int, default=max_retries)
+    parser.add_argument("--api-root", default=None, help="Send all Genius requests to this URL instead")
+    parser.add_argument("--fresh", action="store_true", help="Clear the output and manifest first")
+    args = parser.parse_args()
+
     # Read CSV file
-    songs = []
     try:
-        with open(csv_file, 'r', encoding='utf-8') as f:
-            reader = csv.reader(f)
-            next(reader)  # Skip header
-            for row in reader:
-                if len(row) >= 2:
-                    songs.append((row[0], row[1]))  # (artist, song)
+        songs = read_songs(args.csv)
     except FileNotFoundError:
-        print(f"Error: Could not find {csv_file}")
+        print(f"Error: Could not find {args.csv}")
         return
-    
+
+    if args.fresh:
+        for path in (args.output, args.manifest):
+            if os.path.exists(path):
+                os.remove(path)
+
     total_songs = len(songs)
     print(f"Found {total_songs} songs in CSV")
-    print(f"Starting lyrics collection with {max_workers} workers...")
+    print(f"Starting lyrics collection: {args.concurrency} concurrent, {args.rate} lookups/s...")
     print("=" * 60)
-    
-    # Clear output file
-    with open(output_file, 'w', encoding='utf-8') as f:
-        pass
-    
-    # Process songs concurrently
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures = []
-        
-        for artist, song in songs:
-            future = executor.submit(get_song_lyrics, artist, song, total_songs)
-            futures.append(future)
-            time.sleep(0.1)  # Small delay between submissions
-        
-        # Wait for all to complete
-        for future in futures:
-            try:
-                future.result()
-            except Exception as e:
-                counter.increment()
-    
+
+    fetch = genius_fetcher(make_genius(args.api_root))
+    stats = asyncio.run(run(songs, fetch, args.output, args.manifest, args.concurrency, args.rate, args.retries))
+
     print("\n" + "=" * 60)
     print(f"Complete!")
-    print(f"Total processed: {counter.value}")
-    print(f"Successfully scraped: {counter.success}")
-    print(f"Failed: {counter.value - counter.success}")
-    print(f"Output saved to: {output_file}")
+    print(f"Skipped (already fetched): {stats['skipped']}")
+    print(f"Total processed: {stats['done'] + stats['failed']}")
+    print(f"Successfully scraped: {stats['done']}")
+    print(f"Failed: {stats['failed']}")
+    print(f"Output saved to: {args.output}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
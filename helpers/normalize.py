@@ -0,0 +1,165 @@
+import argparse
+import json
+import multiprocessing
+import re
+import string
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# Pre-compile regex for cleaning
+punct_to_remove = ''.join(c for c in string.punctuation if c not in {"'", "-"})
+punct_pattern = re.compile(f"[{re.escape(punct_to_remove)}]")
+space_pattern = re.compile(r'\s+')
+
+
+# === JSON backend ===
+def loads(line):
+    return orjson.loads(line) if orjson else json.loads(line)
+
+
+def dumps(record):
+    # Always the stdlib encoder: orjson writes compact separators, and the
+    # output bytes should not depend on which backend is installed
+    return json.dumps(record, ensure_ascii=False)
+
+
+# === Stages ===
+# Each stage takes a record and returns it (possibly changed) or None to drop it.
+def clean_lyrics(lyrics):
+    if not lyrics:
+        return []
+
+    cleaned_lines = []
+    for line in lyrics.split('\n')[1:]:  # Skip first line
+        line = line.lower().strip()
+        # Skip common non-lyric lines
+        if any(skip in line for skip in ['embed', 'you might also like', '[verse', '[chorus', '[bridge']):
+            continue
+
+        line = punct_pattern.sub("", line)
+        line = space_pattern.sub(' ', line).strip()
+
+        if line and len(line) > 3:
+            cleaned_lines.append(line)
+
+    return cleaned_lines
+
+
+def clean_raw_lyrics(record):
+    """
+    Turns raw Genius lyrics text into cleaned lines; records that already
+    hold a list of lines pass through.
+    """
+    if isinstance(record.get("lyrics"), str):
+        record["lyrics"] = clean_lyrics(record["lyrics"])
+    return record
+
+
+def drop_read_more(record):
+    record["lyrics"] = [line for line in record.get("lyrics", []) if "read more" not in line.lower()]
+    return record
+
+
+def swap_artist_song(record):
+    """
+    The source CSV lists (song, artist), so grabbed records come out with
+    the two fields swapped.
+    """
+    return {"artist": record["song"], "song": record["artist"], "lyrics": record["lyrics"]}
+
+
+def drop_empty(record):
+    return record if record.get("lyrics") else None
+
+
+STAGES = {
+    "clean": clean_raw_lyrics,
+    "read_more": drop_read_more,
+    "swap": swap_artist_song,
+    "drop_empty": drop_empty,
+}
+
+
+# === Single-pass pipeline ===
+_active_stages = []
+
+
+def set_stages(names):
+    _active_stages[:] = [STAGES[name] for name in names]
+
+
+def normalize_line(line):
+    """
+    Runs every active stage over one JSONL line.
+    Returns the output line, or None when the record is dropped or malformed.
+    """
+    try:
+        record = loads(line)
+    except ValueError:
+        return None  # skip malformed lines
+    for stage in _active_stages:
+        record = stage(record)
+        if record is None:
+            return None
+    return dumps(record) + "\n"
+
+
+def run_pipeline(input_path, output_path, stage_names, workers=1, chunksize=256):
+    """
+    Reads the input once, applies the stages to each record and writes the
+    result once. With workers > 1 the records are normalised in a process
+    pool; output order is unchanged.
+    """
+    set_stages(stage_names)
+    kept = 0
+    dropped = 0
+
+    with open(input_path, 'r', encoding='utf-8') as infile, open(output_path, 'w', encoding='utf-8') as outfile:
+        lines = (line for line in infile if line.strip())
+        if workers > 1:
+            pool = multiprocessing.Pool(workers, set_stages, (stage_names,))
+            results = pool.imap(normalize_line, lines, chunksize)
+        else:
+            pool = None
+            results = map(normalize_line, lines)
+
+        try:
+            for result in results:
+                if result is None:
+                    dropped += 1
+                    continue
+                outfile.write(result)
+                kept += 1
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+
+    return kept, dropped
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Normalise a lyrics JSONL file in one pass")
+    parser.add_argument("--input", default="lyrics_dataset.jsonl")
+    parser.add_argument("--output", default="lyrics_dataset_fixed.jsonl")
+    parser.add_argument("--stages", default="clean,read_more,swap",
+                        help=f"Comma-separated stages to run in order: {', '.join(STAGES)}")
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args()
+
+    stage_names = [name.strip() for name in args.stages.split(",") if name.strip()]
+    unknown = [name for name in stage_names if name not in STAGES]
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(unknown)}")
+
+    kept, dropped = run_pipeline(args.input, args.output, stage_names, args.workers)
+    print(f"✓ Normalised {kept} songs ({dropped} dropped) with stages: {', '.join(stage_names)}")
+    print(f"✓ Output saved to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
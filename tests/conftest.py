@@ -0,0 +1,8 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The pipeline scripts import each other as top-level modules
+for folder in ("core", "helpers"):
+    sys.path.insert(0, os.path.join(ROOT, folder))
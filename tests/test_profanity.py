@@ -0,0 +1,28 @@
+from profanity import DEFAULT_TERMS, TermMatcher, load_terms
+
+
+def matcher():
+    terms, allowed = load_terms(DEFAULT_TERMS)
+    return TermMatcher(terms, allowed=allowed)
+
+
+def test_prefix_match_covers_the_whole_word():
+    spans = matcher().find("you motherfucker, get back")
+    assert [(s["text"], s["term"]) for s in spans] == [("motherfucker", "motherfuck")]
+    assert spans[0]["start"] == 4 and spans[0]["end"] == 16
+
+
+def test_prefix_match_keeps_leet_and_trailing_punctuation_out():
+    spans = matcher().find("sh1tty day, crap!")
+    assert [s["text"] for s in spans] == ["sh1tty", "crap"]
+
+
+def test_allowed_words_are_not_flagged():
+    m = matcher()
+    assert m.find("reading dickens by the fire") == []
+    assert m.find("Emily Dickinson") == []
+    assert [s["text"] for s in m.find("dickhead")] == ["dickhead"]
+
+
+def test_whole_word_terms_still_need_a_boundary():
+    assert matcher().find("class assets") == []
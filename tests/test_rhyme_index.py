@@ -0,0 +1,48 @@
+import json
+
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("Levenshtein")
+
+from pronunciation import guess_record, word_record
+from rhyme_index import RhymeIndex, build_index
+
+
+def write_songs(path, songs):
+    with open(path, "w", encoding="utf-8") as f:
+        for lines in songs:
+            song = {"artist": "a", "title": "t",
+                    "lines": [{"line_id": k, "text": " ".join(w["text"] for w in words), "words": words}
+                              for k, words in enumerate(lines)]}
+            f.write(json.dumps(song) + "\n")
+
+
+def test_build_index_with_guessed_words(tmp_path):
+    source = tmp_path / "rhyme_annotated.jsonl"
+    write_songs(source, [
+        [[guess_record("skrrt")], [word_record("night", ["N", "AY1", "T"])], [guess_record("outside")]],
+        [[guess_record("finesse")], [word_record("light", ["L", "AY1", "T"])], [guess_record("ride")]],
+    ])
+
+    meta = build_index(str(source), str(tmp_path / "index"))
+    index = RhymeIndex(str(tmp_path / "index"))
+
+    assert meta["lines"] == 6
+    hits = [index.locate(line) for line in index.query("AY1 D", min_match_phonemes=2)]
+    assert sorted(line_id for _, line_id in hits) == [2, 2]
+
+
+def test_build_index_past_256_symbols(tmp_path):
+    # Each ending brings two symbols of its own, e.g. pre-ARPAbet guesses
+    source = tmp_path / "rhyme_annotated.jsonl"
+    words = [word_record(f"w{k}", [f"V{k}1", f"C{k}X"]) for k in range(300)]
+    write_songs(source, [[[word]] for word in words] + [[[words[-1]]]])
+
+    meta = build_index(str(source), str(tmp_path / "index"))
+    index = RhymeIndex(str(tmp_path / "index"))
+
+    assert len(meta["symbols"]) == 600
+    assert len(index.query("V2991 C299X", min_match_phonemes=2)) == 2
+    assert index.query("V01 C0X", min_match_phonemes=2) == [0]
+    assert len(index.query("XX1 C299X", min_match_phonemes=1)) == 2